@@ -20,6 +20,9 @@ sys.setdefaultencoding('utf-8')
 # SPPAS tools
 import sppas_tools
 
+# NumPy (imported after sppas_tools, so --startup-profile reports it)
+import numpy as np
+
 # script options
 opts = argparse.Namespace(
     # Input
@@ -27,6 +30,7 @@ opts = argparse.Namespace(
     tiers_names=[],
     # BILOU tier(s)
     base_time=0.1, # BILOU interval's duration
+    base_times=None, # BILOU intervals' durations (option -b, default: [base_time])
     radius=0.0005, # BILOU TimePoint radius
     bilu_format="{:.1}", o_label="",   # BILOU labels format (see bilouTags())
     labels="BILOU", # TODO: use a sub-set of the BILOU tags
@@ -34,6 +38,7 @@ opts = argparse.Namespace(
     # Output
     keep_tiers="process", # in the output keep : 'all' tiers (default), 'process(ed)' tiers or 'any' (i.e. only the BILOU)
     out_file_format="{:s}-BILOU_{:s}",    # output file format (before the extension), 1st element is the filename (without extension), 2nd is the tier(s) name(s)
+    out_matrix=None, # output the BILOU tags as an integer matrix: 'npz' or 'npy' (instead of an annotation file)
     )
 
 # ----------------------------------------------------------------------------
@@ -55,8 +60,11 @@ parser.add_argument("-t", "--tier", "--tier-name", action='append', dest='tiers_
     )
 # BILOU tier(s)
 # - base time
-parser.add_argument("-b", "--base", "--base-time", dest='base_time', type=float
-    , help="time subdivision of the BILOU tier (in second, default:'%f')"%opts.base_time
+parser.add_argument("-b", "--base", "--base-time", dest='base_times', action='append'
+    , type=lambda value: [ float(v) for v in value.split(',') ]
+    , help=("time subdivision of the BILOU tier (in second, default:'%f')."%opts.base_time)
+        +"\nRepeat the option, or give a comma separated list, to create the BILOU tiers of various base times,"
+        +"\ne.g. '-b 0.01,0.02,0.05,0.1'"
     , metavar='<second>'
     )
 # - radius
@@ -105,9 +113,25 @@ parser.add_argument("-k","--keep", "--keep-tiers", dest='keep_tiers'
     , metavar='(all|process|any)'
     , choices=['all','process','processed','any','bilou']
     )
+# - BILOU matrix
+parser.add_argument("-m","--matrix", dest='out_matrix'
+        , help="Output the BILOU tags as an integer matrix (instead of an annotation file),"
+            +"\none row per interval, one column per processed tier"
+            +"\n\t'npz' => a NumPy .npz archive with the 'tags' matrix, the 'labels' vocabulary,"
+            +"\n\t    the 'tiers' names and the intervals 'times' boundaries"
+            +"\n\t'npy' => a NumPy .npy 'tags' matrix (can be memory-mapped) and a .json file"
+            +"\n\t    with the 'labels', 'tiers' and 'times'"
+            +"\nThe label index 0 is always the 'Outside' label."
+    , metavar='(npz|npy)'
+    , choices=['npz','npy']
+    )
 #TODO: output extension
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: jobs
+sppas_tools.parserAddJobsArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
@@ -115,15 +139,20 @@ sppas_tools.parserAddLoadSPPASArgument(parser);
 # ----------------------------------------------------------------------------
 
 
-def bilouTags(ref,dest,labels="BILOU",bilu_format="{:.1}({})",o_label="O",labels_sep=" + "):
+# BILU tags (Outside is any tag)
+BILU = ("Begin", "Inside", "Last", "Unit")
+BEGIN, INSIDE, LAST, UNIT = range(len(BILU))
+
+def bilouTags(ref,times,radius=0.,labels="BILOU",bilu_format="{:.1}({})",o_label="O",labels_sep=" + "):
     """ Compute the BILOU tags corresponding to a tier.
         Example:
           ref =       [------]   [---] [----]    []   [-----]   [] [---------]
           dest= |   |   |   |   |   |   |   |   |   |   |   |   |   |   |   |   |
            =>   | O | B | I | L | B |L+B| L | O | U | B | L | O |U+B| I | I | L |
 
-        @param ref  the reference tier (were are the annotation)
-        @param dest the destination tier (with continious segmentation).
+        @param ref  the reference tier (were are the annotation), or its TierBoundaries
+        @param times the destination (continious segmentation) boundaries, see timeGrid()
+        @param radius   the radius of the destination TimePoint
         @param labels   (TODO) the tagset to use: IO, BIO, BILO, BILOU, etc.
         @param bilu_format  a format for the Begin, In, Last, Unit labels.
             The first format parameter is Begin, Inside, Last, Unit.
@@ -131,113 +160,175 @@ def bilouTags(ref,dest,labels="BILOU",bilu_format="{:.1}({})",o_label="O",labels
             Default: "{:.1}()}", p.e. "B(label)"
         @parma o_label  the label for Outside
         
-        @return ...
+        @return the array of the destination intervals' labels
+    """
+    return BILOUCodes(ref, times, radius).labels(bilu_format, o_label, labels_sep);
+
+class TierBoundaries(object):
+    """ The boundaries of the (labelled) annotations of a tier, as NumPy arrays
+        - starts, ends : the start/end midpoints
+        - starts_radius, ends_radius : the start/end radius
+        - labels_ids : the label index (in labels_voc) of each annotation
+        - labels_voc : the labels
+        Computed once, they can be compared to various time grids (see BILOUCodes).
+    """
+    def __init__(self, ref):
+        annots = [annot for annot in ref if annotHasLabel(annot)]
+        locations = [annot.GetLocation() for annot in annots]
+        refLabels = [annot.GetLabel().GetValue() for annot in annots]
+        self.labels_voc = sorted(set(refLabels))
+        vocIndex = dict((label, i) for i, label in enumerate(self.labels_voc))
+        self.labels_ids = np.array([vocIndex[label] for label in refLabels], dtype=np.intp)
+        self.starts = np.array([l.GetBeginMidpoint() for l in locations], dtype=float)
+        self.ends = np.array([l.GetEndMidpoint() for l in locations], dtype=float)
+        self.starts_radius = np.array([l.GetBeginRadius() for l in locations], dtype=float)
+        self.ends_radius = np.array([l.GetEndRadius() for l in locations], dtype=float)
+
+    def __len__(self):
+        return len(self.starts)
+
+class BILOUCodes(object):
+    """ The BILOU tags of a reference tier over a time grid, as NumPy arrays
+        - times : the (n+1) boundaries of the n destination intervals
+        - slots, codes, labels_ids : one element per tag, sorted by interval then
+          reference annotation, i.e. the interval index, the tag (BEGIN, INSIDE,
+          LAST or UNIT) and the reference annotation's label index (in labels_voc)
+        - labels_voc : the reference labels
+        The intervals without any tag are Outside.
+        Time points are compared as the SPPAS TimePoint do (i.e. with the radius),
+        then the tags are the same than walking the intervals: the reference
+        annotations are expected to be sorted and not to overlap each other.
+    """
+    def __init__(self, ref, times, radius=0.):
+        """
+            @param ref  the reference tier, or its TierBoundaries
+            @param times the destination (continious segmentation) boundaries, see timeGrid()
+            @param radius   the radius of the destination TimePoint
+        """
+        if not isinstance(ref, TierBoundaries):
+            ref = TierBoundaries(ref)
+        self.times = times = np.asarray(times, dtype=float)
+        n = max(len(times) - 1, 0)
+        self.labels_voc = ref.labels_voc
+        used = slice(None) if n else slice(0)
+        refIds = ref.labels_ids[used]
+        starts = ref.starts[used]; ends = ref.ends[used]
+        startsTol = ref.starts_radius[used] + radius
+        endsTol = ref.ends_radius[used] + radius
+        # destination interval of each reference start (Begin) and end (Last/Unit)
+        destStarts = times[:-1]; destEnds = times[1:]
+        jEnd = firstIndex(destEnds, ends, lambda e, de: timeLe(e, de, endsTol), ends - endsTol)
+        jStart = firstIndex(destEnds, starts, lambda s, de: timeLt(s, de, startsTol), starts + startsTol)
+        jLast = np.minimum(jEnd, n - 1)
+        # the reference annotations ending before/at the start of their first interval are skipped
+        valid = (jStart <= jEnd) & (jStart < n) & ~timeLe(ends, destStarts[jLast], endsTol)
+        startsIn = timeLe(destStarts[np.minimum(jStart, n - 1)], starts, startsTol)
+        # Last/Unit
+        lu = valid & (jEnd < n)
+        luCodes = np.where((jStart == jEnd) & startsIn, UNIT, LAST)[lu]
+        # Begin (or Inside when the reference starts before the first interval)
+        bi = valid & (jStart < jEnd)
+        biCodes = np.where(startsIn, BEGIN, INSIDE)[bi]
+        # Inside
+        inCounts = np.where(valid, np.maximum(np.minimum(jEnd, n) - jStart - 1, 0), 0)
+        inRefs = np.repeat(np.arange(len(starts)), inCounts)
+        inSlots = np.repeat(jStart + 1 - np.cumsum(inCounts) + inCounts, inCounts) + np.arange(len(inRefs))
+        # all tags, sorted by interval then reference
+        refs = np.concatenate([np.flatnonzero(lu), np.flatnonzero(bi), inRefs])
+        slots = np.concatenate([jEnd[lu], jStart[bi], inSlots])
+        codes = np.concatenate([luCodes, biCodes, np.repeat(INSIDE, len(inRefs))])
+        order = np.lexsort((refs, slots))
+        self.slots = slots[order].astype(np.intp)
+        self.codes = codes[order].astype(np.intp)
+        self.labels_ids = refIds[refs[order]]
+
+    def __len__(self):
+        """ number of destination intervals """
+        return max(len(self.times) - 1, 0)
+
+    def labels(self, bilu_format="{:.1}({})", o_label="O", labels_sep=" + "):
+        """ Format the destination intervals labels (see bilouTags())
+            Each (tag, reference label) is formatted once.
+            @return the array of the destination intervals' labels
+        """
+        labels = np.empty(len(self), dtype=object)
+        labels[:] = o_label
+        if not len(self.slots):
+            return labels;
+        nVoc = len(self.labels_voc)
+        keys, keysIndex = np.unique(self.codes * nVoc + self.labels_ids, return_inverse=True)
+        tags = np.array([bilu_format.format(BILU[key // nVoc], self.labels_voc[key % nVoc]) for key in keys.tolist()], dtype=object)[keysIndex]
+        slots, first, counts = np.unique(self.slots, return_index=True, return_counts=True)
+        single = counts == 1
+        labels[slots[single]] = tags[first[single]]
+        for (slot, i, count) in zip(slots[~single].tolist(), first[~single].tolist(), counts[~single].tolist()):
+            labels[slot] = labels_sep.join(tags[i:i+count])
+        return labels;
+
+def firstIndex(bounds, values, test, approx):
+    """ For each value, the index of the first bound such as test(value, bound) is True
+        (test must be monotonic) or len(bounds)
+        @param approx the approximated bounds (for searchsorted)
     """
-    # usefull value
-    destMaxEnd = dest.GetEnd()
-    # iterator on the reference's intervals
-    def nextRef(it):
-        annot = nextOrNone(it);
-        while (not annotHasLabel(annot,True)):
-            #sys.stderr.write('#'); sys.stderr.flush(); # debug
-            annot = nextOrNone(it);
-        start = annotBegin(annot, destMaxEnd)
-        end = annotEnd(annot, destMaxEnd)
-        #sys.stderr.write('|'); sys.stderr.flush(); # debug
-        return (annot, start, end);
-    itRef = iter(ref);
-    refAnnot, refStart, refEnd = nextRef(itRef);
-    #sys.stderr.write("first ref [%s,%s]\n" % (refStart, refEnd)); sys.stderr.flush(); # debug
-    # go through destination annotation
-    destLastEnd = dest.GetBeginValue();
-    for destAnnot in dest:
-        #sys.stderr.write('.'); sys.stderr.flush(); # debug
-        destStart = annotBegin(destAnnot)
-        destEnd = annotEnd(destAnnot)
-        #TODO: check/add [destLastEnd,destStart[ interval
-        # Skip the reference intervals that ends before the destination interval
-        while (refEnd <= destStart): # the reference intervals end before dest => go to the next reference interval
-            #sys.stderr.write(refEnd+"<"+destStart); sys.stderr.flush(); # debug
-            refAnnot, refStart, refEnd = nextRef(itRef);
-            #sys.stderr.write("before => ref [%s,%s]\n" % (refStart, refEnd)); sys.stderr.flush(); # debug
-
-        relations=[];
-        while (True): # relations 'loop'
-            # Here refEnd > destStart => the reference interval overlaps or is after the destination
-            if (destEnd <= refStart): # dest ends before ref starts => Outside
-                relations.append(["Outside"])
-                #sys.stderr.write('o'); sys.stderr.flush(); # debug
-                break; # relations loop
-            # Here destEnd > refStart, i.e. reference and destination overlaps
-            
-            # (a) look for Last/Unit
-            while ((refStart < destEnd) and (refEnd <= destEnd)):  # ref ends inside dest => Last/Unit
-                #sys.stderr.write('l'); sys.stderr.flush(); # debug
-                if (destStart <= refStart): # Unit
-                    #TODO: insert "Outside" if destStart < refStart
-                    relations.append(["Unit",refAnnot]);
-                    #sys.stderr.write("U [%s,%s] in [%s,%s]\n" % (refStart, refEnd, destStart, destEnd)); sys.stderr.flush(); # debug
-                else:   # Last
-                    relations.append(["Last",refAnnot]);
-                    #sys.stderr.write("L [%s,%s] ends in [%s,%s]\n" % (refStart, refEnd, destStart, destEnd)); sys.stderr.flush(); # debug
-                # go to the next reference, see the L+B case in the example
-                refAnnot, refStart, refEnd = nextRef(itRef);
-                #sys.stderr.write("last/unit => ref [%s,%s]\n" % (refStart, refEnd)); sys.stderr.flush(); # debug
-                #TODO: insert "Outside" if lastRefEnd < refStart
-            # HERE: We have add all ref annotation that ends inside dest (if any)
-            
-            # (b) look for Unit/Begin
-            while ((refStart < destEnd) and (destStart <= refStart)): # ref start in dest => Begin/Unit
-                #sys.stderr.write('b'); sys.stderr.flush(); # debug
-                if (refEnd <= destEnd):  # Unit
-                    #TODO: insert "Outside" if destStart < refStart
-                    relations.append(["Unit",refAnnot]);
-                    #sys.stderr.write("U [%s,%s] in [%s,%s]\n" % (refStart, refEnd, destStart, destEnd)); sys.stderr.flush(); # debug
-                    refAnnot, refStart, refEnd = nextRef(itRef);  # case of various Unit/Begin, see U+B in the example
-                    #sys.stderr.write("unit => ref [%s,%s]\n" % (refStart, refEnd)); sys.stderr.flush(); # debug
-                else:
-                    #TODO: insert "Outside" if destStart < refStart
-                    relations.append(["Begin",refAnnot]);
-                    #sys.stderr.write("B [%s,%s] starts in [%s,%s]\n" % (refStart, refEnd, destStart, destEnd)); sys.stderr.flush(); # debug
-                    break;
-            # HERE: We have add all ref annotation that starts inside dest (if any)
-
-            # (c) Check Inside
-            if ((refStart < destStart) and (destEnd < refEnd)):
-                #sys.stderr.write('i'); sys.stderr.flush(); # debug
-                relations.append(["Inside",refAnnot]);
-                #sys.stderr.write("I [%s,%s] overs [%s,%s]\n" % (refStart, refEnd, destStart, destEnd)); sys.stderr.flush(); # debug
-            break;  # relations loop
-        # HERE: relations contains a list of BILOU relations
-        labels = [];
-        for rel in relations:
-            if ("Outside" == rel[0]):
-                labels.append(o_label);
-            else:
-                labels.append(bilu_format.format(rel[0], rel[1].GetLabel().GetValue()));
-        destAnnot.GetLabel().SetValue(labels_sep.join(labels));
-    # HERE: all dest annotation are process
-    # TODO: look for remaining ref annot
-    return;
-
-def annotBegin(annot,orValue=0.):
-    return annot.GetLocation().GetBegin() if annot is not None else orValue;
-
-def annotEnd(annot,orValue=0.):
-    return annot.GetLocation().GetEnd() if annot is not None else orValue;
+    n = len(bounds)
+    j = np.maximum(np.searchsorted(bounds, approx) - 1, 0)
+    if not n:
+        return j;
+    for step in range(3): # fix the rounding differences between approx and test
+        k = np.minimum(j, n - 1)
+        j = np.where((j < n) & ~test(values, bounds[k]), j + 1, j)
+    return j;
+
+def timeEq(a, b, tol):
+    """ a == b as TimePoint (i.e. with tol=radius(a)+radius(b)) """
+    return np.abs(a - b) <= tol;
+
+def timeLe(a, b, tol):
+    """ a <= b as TimePoint """
+    return (a < b) | timeEq(a, b, tol);
+
+def timeLt(a, b, tol):
+    """ a < b as TimePoint """
+    return (a < b) & ~timeEq(a, b, tol);
 
 def annotHasLabel(annot,noneValue=False):
     if (annot is None):
         return noneValue;
     return len(annot.GetLabel().GetValue())>0;
 
-def nextOrNone(it,stopValue=None):
-    """ Get the next value of an iterator or stopValue
+def timeGrid(duration,maxTime,minTime=0.):
+    """ Generate the boundaries of the intervals of equals duration between [minTime,maxTime]
+        @param duration the intervals duration
+        @param maxTime  the maximum time for the intervals (inclusive)
+        @param minTime  the minimum time for the intervals (default:0.)
+
+        @return the array of the (n+1) boundaries of the n intervals
     """
-    try:
-        return it.next();
-    except StopIteration:
-        return stopValue;
+    minTime = float(minTime); maxTime = float(maxTime)
+    count = int(np.floor((maxTime - minTime) / duration)) + 2 if maxTime > minTime else 1
+    # successive additions (i.e. the same float values than adding the duration to each interval's end)
+    times = np.add.accumulate(np.concatenate([[minTime], np.repeat(float(duration), count)]))
+    return times[:1 + np.searchsorted(times[1:], maxTime, side='right')];
+
+def annotateIntervals(tier,times,labels,radius=0.):
+    """ Create the annotations of consecutives intervals
+        @param tier (optional) the tier where append the intervals
+        @param times the intervals (n+1) boundaries, see timeGrid()
+        @param labels   the intervals (n) labels
+        @param radius   the radius precision for intervals TimePoint.
+
+        @return the list of Annotation
+    """
+    from annotationdata import Tier, TimePoint, TimeInterval, Label, Annotation
+    annots = [];
+    points = [TimePoint(time, radius) for time in np.asarray(times).tolist()]
+    for (startPoint, endPoint, label) in zip(points[:-1], points[1:], labels):
+        interval = TimeInterval(startPoint, endPoint)
+        annot = Annotation(interval,Label(label))
+        annots.append(annot)
+        if isinstance(tier,Tier):
+            tier.Append(annot)  # intervals are sorted
+    return annots;
 
 def splitIntervals(tier,duration,maxTime,minTime=0.,radius=0.,label_format="",first_index=1):
     """ Generate the intervals of equals duration between [minTime,maxTime]
@@ -251,24 +342,45 @@ def splitIntervals(tier,duration,maxTime,minTime=0.,radius=0.,label_format="",fi
 
         @return the list of Annotation
     """
-    from annotationdata import Tier, TimePoint, TimeInterval, Label, Annotation
-    annots = [];
-    startPoint = TimePoint(minTime, radius);
-    endTime = minTime + duration;
-    index = first_index
-    while (endTime <= maxTime):
-        endPoint = TimePoint(endTime,radius);
-        interval = TimeInterval(startPoint, endPoint)
-        label = Label(label_format.format(index))
-        annot = Annotation(interval,label)
-        annots.append(annot)
-        if isinstance(tier,Tier):
-            tier.Add(annot)
-        # next
-        startPoint = endPoint
-        endTime += duration
-        index += 1
-    return annots;
+    times = timeGrid(duration, maxTime, minTime)
+    labels = [label_format.format(index) for index in range(first_index, first_index + len(times) - 1)]
+    return annotateIntervals(tier, times, labels, radius);
+
+def bilouMatrix(labels,o_label=""):
+    """ Encode the BILOU labels of various tiers as an integer matrix
+        @param labels   the list of the tiers' labels (see bilouTags()), with the same length
+        @param o_label  the 'Outside' label, always coded 0
+
+        @return (matrix, vocabulary) with matrix[interval, tier] the index of the label in vocabulary
+    """
+    count = len(labels[0]) if len(labels) else 0
+    allLabels = np.concatenate([np.asarray(tierLabels, dtype=object) for tierLabels in labels]) if len(labels) else np.empty(0, dtype=object)
+    uniqueLabels, codes = np.unique(allLabels, return_inverse=True)
+    vocabulary = [o_label] + [label for label in uniqueLabels.tolist() if label != o_label]
+    vocIndex = dict((label, i) for i, label in enumerate(vocabulary))
+    remap = np.array([vocIndex[label] for label in uniqueLabels.tolist()], dtype=np.int32)
+    matrix = remap[codes].reshape((len(labels), count)).T if len(codes) else np.zeros((count, len(labels)), dtype=np.int32)
+    return (np.ascontiguousarray(matrix, dtype=np.int32), vocabulary);
+
+def saveBILOUMatrix(filename,matrix_format,times,names,labels,o_label=""):
+    """ Save the BILOU labels of various tiers as an integer matrix (see bilouMatrix())
+        @param filename the output file name (without extension)
+        @param matrix_format 'npz' => filename.npz with the 'tags', 'labels', 'tiers' and 'times' arrays
+                             'npy' => filename.npy with the tags matrix (can be memory-mapped, see numpy.load)
+                                      and filename.json with the 'labels', 'tiers' and 'times'
+        @param times    the intervals boundaries (see timeGrid())
+        @param names    the BILOU tiers names
+        @param labels   the BILOU tiers labels (see bilouTags())
+    """
+    (matrix, vocabulary) = bilouMatrix(labels, o_label)
+    if matrix_format == 'npz':
+        np.savez(filename + '.npz', tags=matrix, labels=np.array(vocabulary, dtype=unicode)
+            , tiers=np.array(names, dtype=unicode), times=np.asarray(times, dtype=float))
+    else:
+        import json
+        np.save(filename + '.npy', matrix)
+        with open(filename + '.json', 'w') as fd:
+            json.dump({ 'labels': vocabulary, 'tiers': names, 'times': np.asarray(times).tolist() }, fd)
 
 # ----------------------------------------------------------------------------
 def process_files(files, opts):
@@ -276,46 +388,68 @@ def process_files(files, opts):
         @param files the file(s) to process
     """
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
+    sppas_tools.processFiles(process_file, files, opts)
+
+def process_file(f, opts):
+    """ Process one file
+        @param f the file to process
+    """
     from annotationdata import Transcription, Tier  #, TimePoint, TimeInterval, Label, Annotation
-    for f in files:
-        print("[%s] Loading annotation file..." % f)
-        # Read an annotated file
-        trs = annotationdata.aio.read(f)
-        print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
-
-        # Prepare the output Transcription
-        destTrs = trs; destAppendProcessed=False;   # default/'all' => work directly on trs
-        if (opts.keep_tiers.startswith('process')):
-            destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
-            destAppendProcessed=True; # append processed tiers
-        elif ((opts.keep_tiers == 'any') or (opts.keep_tiers == 'bilou')):
-            destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
-            
-        # Look for the tier to process
-        for tier_name in opts.tiers_names:
-            tier = sppas_tools.tierFind(trs, tier_name)
-            if tier is None:
-                print("[%s] Any tier with name similar to '%s' ;-(" %  (f, opts.tier_name))
-                print("[%s] Tiers are : %s" % (f, 
-                    ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
-                    ))
-                break;
-            print("[%s] Searched tier '%s' has %d annotations" % (f, tier.GetName(), tier.GetSize()))
-            if (destAppendProcessed):
-                destTrs.Append(tier);
+    print("[%s] Loading annotation file..." % f)
+    # Read an annotated file
+    trs = annotationdata.aio.read(f)
+    print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
+
+    # Prepare the output Transcription
+    destTrs = trs; destAppendProcessed=False;   # default/'all' => work directly on trs
+    if (opts.keep_tiers.startswith('process')):
+        destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
+        destAppendProcessed=True; # append processed tiers
+    elif ((opts.keep_tiers == 'any') or (opts.keep_tiers == 'bilou')):
+        destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
+    # The BILOU intervals boundaries, for each base time
+    grids = [ (base_time, timeGrid(base_time, trs.GetMaxTime(), trs.GetMinTime())) for base_time in opts.base_times ]
+    bilouNames = [ [] for grid in grids ]; bilouLabels = [ [] for grid in grids ];  # for the BILOU matrix
+        
+    # Look for the tier to process
+    for tier_name in opts.tiers_names:
+        tier = sppas_tools.tierFind(trs, tier_name)
+        if tier is None:
+            print("[%s] Any tier with name similar to '%s' ;-(" %  (f, opts.tier_name))
+            print("[%s] Tiers are : %s" % (f, 
+                ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
+                ))
+            break;
+        print("[%s] Searched tier '%s' has %d annotations" % (f, tier.GetName(), tier.GetSize()))
+        if (destAppendProcessed and not opts.out_matrix):
+            destTrs.Append(tier);
+        refBoundaries = TierBoundaries(tier);   # shared by all the base times
+        for (i, (base_time, times)) in enumerate(grids):
+            # Compute the BILOU tags
+            bilouName = opts.out_tier_format.format(tier_name, base_time);
+            labels = bilouTags(refBoundaries,times,opts.radius,opts.labels,opts.bilu_format,opts.o_label);
+            if opts.out_matrix:
+                bilouNames[i].append(bilouName); bilouLabels[i].append(labels);
+                continue;
             # Create the BILOU tier
-            bilouName = opts.out_tier_format.format(tier_name, opts.base_time);
             bilouTier = Tier(bilouName);
-            splitIntervals(bilouTier,opts.base_time, trs.GetMaxTime(), trs.GetMinTime(), opts.radius)
-            bilouTags(tier,bilouTier,opts.labels,opts.bilu_format,opts.o_label);
+            annotateIntervals(bilouTier, times, labels, opts.radius)
             print("[%s] BILOU tier '%s' has %d annotations" % (f, bilouTier.GetName(), bilouTier.GetSize()))
             destTrs.Append(bilouTier);
-        # Saving file
-        (root, ext) = os.path.splitext(f)
-        of = opts.out_file_format.format(root,"+".join(opts.tiers_names)) + ext
-        print("[%s] Saving annotations into %s" % (f, of))
-        annotationdata.aio.write(of, destTrs)
-        
+    # Saving file
+    (root, ext) = os.path.splitext(f)
+    if opts.out_matrix:
+        for (i, (base_time, times)) in enumerate(grids):
+            of = opts.out_file_format.format(root,"+".join(opts.tiers_names))
+            if len(grids) > 1: # one matrix per base time
+                of += "-{:.3f}s".format(base_time)
+            print("[%s] Saving BILOU matrix into %s.%s" % (f, of, opts.out_matrix))
+            saveBILOUMatrix(of, opts.out_matrix, times, bilouNames[i], bilouLabels[i], opts.o_label)
+        return;
+    of = opts.out_file_format.format(root,"+".join(opts.tiers_names)) + ext
+    print("[%s] Saving annotations into %s" % (f, of))
+    annotationdata.aio.write(of, destTrs)
+    
 # ----------------------------------------------------------------------------
 # --- Main stuffs
 # ----------------------------------------------------------------------------
@@ -333,6 +467,12 @@ def main():
         print("ERROR: at least one tier-name to process is required", file=sys.stderr)
         parser.print_help()
         exit(1)
+    # base times (without duplicates)
+    opts.base_times = [ base_time for base_times in opts.base_times for base_time in base_times ] if opts.base_times else [ opts.base_time ]
+    opts.base_times = [ base_time for i, base_time in enumerate(opts.base_times) if base_time not in opts.base_times[:i] ]
+    if [ base_time for base_time in opts.base_times if base_time <= 0 ]:
+        print("ERROR: base time(s) must be positive", file=sys.stderr)
+        exit(1)
     sppas_tools.load_sppas(opts);
     process_files(opts.files, opts)
 
@@ -20,6 +20,9 @@ sys.setdefaultencoding('utf-8')
 # SPPAS tools
 import sppas_tools
 
+# NumPy (imported after sppas_tools, so --startup-profile reports it)
+import numpy as np
+
 # script options
 opts = argparse.Namespace(
     # Input
@@ -32,6 +35,9 @@ opts = argparse.Namespace(
     bound_type='point',   # generate points or intervals
     # Equals tier(s)
     equals_tier=False,
+    equals_all_pairs=False, # compare each pair of tiers (or only the first tier with the others)
+    # Agreement mode
+    agreement_radii=None, # radius of the boundaries compared in the agreement mode (option -a, None => create the boundaries tiers)
     equals_label_format="SameTime({x},{y})",
     equals_tier_format="Boundaries {:s} VS {:s}",
     # Output
@@ -113,6 +119,10 @@ parser.add_argument("-e","--equals", "--equals-tier", dest='equals_tier'
         , const=True
         , help="Calculate equals boundaries (only if various tiers, compared to the first one)"
     )
+parser.add_argument("-E","--equals-all", "--all-pairs", dest='equals_all_pairs'
+        , action='store_true'
+        , help="Calculate equals boundaries between each pair of tiers (not only with the first one)"
+    )
 # - Equals label format
 parser.add_argument("--equals-label", "--equals-label-format", dest='equals_label_format'
         , help=("Format for the Equals tier(s) labels (default:'%s')"%opts.equals_label_format)
@@ -128,6 +138,16 @@ parser.add_argument("--equals-tier-format", dest='equals_tier_format'
             +"\n\tSecond field({1:}) is the reference tier name (i.e. the first tier)"
     , metavar='<format>'
     )
+# Agreement mode
+parser.add_argument("-a", "--agreement", dest='agreement_radii', action='append'
+    , type=lambda value: [ float(v) for v in value.split(',') ]
+    , help="Agreement mode: compute the boundaries precision, recall and F1 of each pair of tiers"
+        +"\n\t(any boundaries tier or output file), with this radius for the boundaries points (in second)."
+        +"\n\tTwo boundaries agree if they are at the same time (i.e. not more than twice the radius between them),"
+        +"\n\teach boundary agreeing with at most one boundary of the other tier (the closest pairs first)."
+        +"\nRepeat the option, or give a comma separated list, to use various radius, e.g. '-a 0.01,0.02 -a 0.05'"
+    , metavar='<second>'
+    )
 # Output
 # - Output file (format)
 parser.add_argument("-o","--outfile", "--outfile-format", dest='out_file_format'
@@ -148,6 +168,10 @@ parser.add_argument("-k","--keep", "--keep-tiers", dest='keep_tiers'
 #TODO: output extension
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: jobs
+sppas_tools.parserAddJobsArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
@@ -156,7 +180,6 @@ sppas_tools.parserAddLoadSPPASArgument(parser);
 
 
 def boundaries(ref,radius,bound_type='point',minTime=0.,maxTime=None,begin_format="{:.1}({})",end_format="{:.1}({})"):
-    from annotationdata import TimePoint, TimeInterval, Annotation, Label
     """ Compute the Boundaries point/intervals corresponding to a tier.
         Example:
           ref =       [--1---]     [-2--]   [--3--]     [4]     [--5--]
@@ -175,124 +198,241 @@ def boundaries(ref,radius,bound_type='point',minTime=0.,maxTime=None,begin_forma
             see begin_format
         
         @return the list of boundaries annotations
+        See Boundaries (the boundaries are computed as arrays, then converted in annotations)
     """
-    # usefull value
-    build_intervals = bound_type.startswith('interval');
-    # iterator on the reference's intervals
-    def nextRef(it):
-        annot = nextOrNone(it);
-        while (not annotHasLabel(annot,True)):
-            #sys.stderr.write('#'); sys.stderr.flush(); # debug
-            annot = nextOrNone(it);
-        return annot;
-    itRef = iter(ref);
+    return Boundaries(ref, radius, bound_type, minTime, maxTime).annotations(begin_format, end_format)
 
-    boundaries = []
-    refAnnot = nextRef(itRef);
-    while (refAnnot is not None):
-        # (a) get begin/end point
-        beginPoint = annotBegin(refAnnot);
-        endPoint = annotEnd(refAnnot);
-        # compute the Begin/End labels
-        beginLabel = Label(begin_format.format('Begin', refAnnot.GetLabel().GetValue()))
-        endLabel = Label(end_format.format('End', refAnnot.GetLabel().GetValue()))
-        # (b) adjust radius/build interval for refAnnot
-        beginAnnot = endAnnot = None
-        if (build_intervals):
-            beginP1 = TimePointSub(beginPoint, radius, minTime)
-            beginP2 = TimePointAdd(beginPoint, radius, maxTime)
-            endP1 = TimePointSub(endPoint, radius, minTime)
-            endP2 = TimePointAdd(endPoint, radius, maxTime)
-            beginAnnot = Annotation(TimeInterval(beginP1,beginP2),beginLabel)
-            endAnnot = Annotation(TimeInterval(endP1,endP2),endLabel)
+class Boundaries(object):
+    """ The Boundaries points/intervals of the (labelled) annotations of a tier, as NumPy arrays,
+        in the time order, i.e. [B1, E1, B2, E2, ...] for the reference annotations 1, 2, ...
+        - starts, ends : the boundaries begin/end midpoints (the same for points)
+        - starts_radius, ends_radius : the boundaries begin/end radius
+        - labels : the reference annotation label (one per reference annotation)
+        - is_point : points or intervals
+        The Annotations are only created by annotations().
+    """
+    def __init__(self, ref, radius, bound_type='point', minTime=0., maxTime=None):
+        """
+            @param ref  the reference tier
+            @param radius   new points radius (if non-negative) or intervals precision
+                (negative => use the reference points radius)
+            @param bound_type   points or intervals
+            @param minTime, maxTime the limits of the intervals (None => any limit)
+        """
+        annots = [annot for annot in ref if annotHasLabel(annot)]
+        locations = [annot.GetLocation() for annot in annots]
+        self.labels = [annot.GetLabel().GetValue() for annot in annots]
+        self.is_point = not bound_type.startswith('interval')
+        # reference points, interleaved: B1, E1, B2, E2, ...
+        points = np.array([(l.GetBeginMidpoint(), l.GetEndMidpoint()) for l in locations], dtype=float).reshape(-1)
+        radii = np.array([(l.GetBeginRadius(), l.GetEndRadius()) for l in locations], dtype=float).reshape(-1)
+        if self.is_point:
+            if radius >= 0:
+                radii = np.full_like(radii, radius)
+            self.starts = self.ends = points
+            self.starts_radius = self.ends_radius = radii
+            return
+        # intervals [point-radius, point+radius] (negative radius => use the points radius, then set to 0.)
+        if radius >= 0:
+            (values, radii) = (radius, radii)
         else:
-            if (radius >= 0):
-                beginPoint = beginPoint.Copy(); beginPoint.SetRadius(radius);
-                endPoint = endPoint.Copy(); endPoint.SetRadius(radius);
-            beginAnnot = Annotation(beginPoint,beginLabel)
-            endAnnot = Annotation(endPoint,endLabel)
-        # (d) next
-        boundaries.extend([beginAnnot,endAnnot]);
-        refAnnot = nextRef(itRef)
-    # in case of intervals, correct overlaps
-    if (build_intervals):
-        lastAnnot = None
-        for annot in boundaries:
-            if (lastAnnot is None):
-                lastAnnot = annot;
-                continue;
-            lastEnd = annotEnd(lastAnnot)
-            begin = annotBegin(annot)
-            if (lastEnd > begin):
-                midpoint = MidPoint(begin, lastEnd)
-                #sys.stderr.write("Overlaps %s and %s => %s\n"%(lastAnnot,annot,midpoint)); sys.stderr.flush();#DEBUG
-                lastAnnot.GetLocation().SetEnd(midpoint)
-                annot.GetLocation().SetBegin(midpoint)
-            lastAnnot = annot;
-    # done
-    return boundaries;
+            (values, radii) = (radii, np.zeros_like(radii))
+        starts = points - values
+        if minTime is not None:
+            starts = np.maximum(starts, minTime)
+        ends = points + values
+        if maxTime is not None:
+            ends = np.minimum(ends, maxTime)
+        starts_radius = radii; ends_radius = radii.copy()
+        # correct overlaps, i.e. previous end > begin (as TimePoint), with their midpoint
+        overlaps = (ends[:-1] - starts[1:]) > (ends_radius[:-1] + starts_radius[1:])
+        midpoints = (starts[1:] + ends[:-1]) / 2.
+        ends[:-1][overlaps] = midpoints[overlaps]
+        ends_radius[:-1][overlaps] = starts_radius[1:][overlaps]
+        starts[1:][overlaps] = midpoints[overlaps]
+        (self.starts, self.ends, self.starts_radius, self.ends_radius) = (starts, ends, starts_radius, ends_radius)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def withRadius(self, radius):
+        """ A copy of the (points) Boundaries with an other radius (the arrays are shared) """
+        res = Boundaries.__new__(Boundaries)
+        res.__dict__.update(self.__dict__)
+        res.starts_radius = res.ends_radius = np.full_like(self.starts, radius)
+        return res
+
+    def annotations(self, begin_format="{:.1}({})", end_format="{:.1}({})"):
+        """ Create the boundaries annotations
+            @param begin_format, end_format  format for the Begin/End labels (see boundaries())
+            @return the list of boundaries annotations
+        """
+        from annotationdata import TimePoint, TimeInterval, Annotation, Label
+        texts = {}  # (format, kind, label) => formatted label
+        def text(fmt, kind, label):
+            key = (fmt, kind, label)
+            if key not in texts:
+                texts[key] = fmt.format(kind, label)
+            return texts[key]
+        labels = []
+        for label in self.labels:
+            labels.append(text(begin_format, 'Begin', label))
+            labels.append(text(end_format, 'End', label))
+        # no garbage collection while creating (a lot of) annotations
+        import gc
+        gcEnabled = gc.isenabled(); gc.disable()
+        try:
+            if self.is_point:
+                return [Annotation(TimePoint(point, radius), Label(label))
+                    for (point, radius, label) in zip(self.starts.tolist(), self.starts_radius.tolist(), labels)]
+            return [Annotation(TimeInterval(TimePoint(start, start_radius), TimePoint(end, end_radius)), Label(label))
+                for (start, start_radius, end, end_radius, label) in zip(self.starts.tolist(), self.starts_radius.tolist()
+                    , self.ends.tolist(), self.ends_radius.tolist(), labels)]
+        finally:
+            if gcEnabled: gc.enable()
 
 def filterEquals(xTier, yTier, bound_type='point', equals_label_format='{x}'):
-    from annotationdata import Rel, Filter, RelationFilter
-    build_intervals = bound_type.startswith('interval');
-    
-    # create the filters
-    xFilter = Filter(xTier)
-    yFilter = Filter(yTier)
-    # create the predicate
-    equals = Rel("equals") if not(build_intervals) else  Rel("convergent");
-    #TODO: filter boundaries with the same labels
-    equalsFilter = RelationFilter(equals, xFilter, yFilter)
-    return equalsFilter.Filter(annotformat=equals_label_format)
+    """ The boundaries of xTier equals (points) or convergent (intervals) to one of yTier
+        (as RelationFilter with Rel("equals") or Rel("convergent"), see equalsPairs)
+        @param equals_label_format  format of the labels ({x}/{y} the x/y labels, {rel} the relation)
+        @return a tier with a copy of the x boundaries (for each one, its first equal y gives the label)
+    """
+    from annotationdata import Tier, Annotation, Label
+    rel = "convergent" if bound_type.startswith('interval') else "equals"
+    xAnnots = list(xTier); yAnnots = list(yTier);
+    (xIndexes, yIndexes) = equalsPairs(TierTimes(xAnnots), TierTimes(yAnnots))
+    first = np.ones(len(xIndexes), dtype=bool)  # first pair of each x
+    first[1:] = xIndexes[1:] != xIndexes[:-1]
+    equalsTier = Tier()
+    for (xIndex, yIndex) in zip(xIndexes[first].tolist(), yIndexes[first].tolist()):
+        (x, y) = (xAnnots[xIndex], yAnnots[yIndex])
+        equalsTier.Append(Annotation(x.GetLocation().Copy(), Label(equals_label_format.format(
+            x=x.GetLabel().GetValue(), y=y.GetLabel().GetValue(), rel=rel))))
+    return equalsTier
+
+class TierTimes(object):
+    """ The times of the annotations of a tier, as NumPy arrays
+        (starts, ends, starts_radius and ends_radius, like a Boundaries)
+    """
+    def __init__(self, annots):
+        locations = [annot.GetLocation() for annot in annots]
+        self.starts = np.array([l.GetBeginMidpoint() for l in locations], dtype=float)
+        self.ends = np.array([l.GetEndMidpoint() for l in locations], dtype=float)
+        self.starts_radius = np.array([l.GetBeginRadius() for l in locations], dtype=float)
+        self.ends_radius = np.array([l.GetEndRadius() for l in locations], dtype=float)
 
+    def __len__(self):
+        return len(self.starts)
 
-def TimePointAdd(timePoint,value,maxValue=None):
-    res = timePoint.Copy()
-    if (value<0.):  # case of negative value => use the radius
-        value = timePoint.GetRadius()
-        res.SetRadius(0.);
-    midpoint = timePoint.GetMidpoint() + value
-    if ((maxValue is not None) and (midpoint>maxValue)):
-        midpoint=maxValue
-    res.SetMidpoint(midpoint)
-    return res;
+def equalsPairs(x, y):
+    """ Find the pairs of x/y boundaries at the same time, i.e. the convergent
+        intervals (x.start <= y.end and y.start <= x.end) - for points, it's
+        the equals relation - with the points compared as the SPPAS TimePoint
+        do (a <= b if a-b <= radius(a)+radius(b)).
+        The y boundaries are sorted by start (i.e. they are already sorted for
+        a Boundaries or a boundaries tier), then, for all the x boundaries at
+        once, the y range that can be convergent is found by a binary search
+        (a sweep of the two time-sorted lists); only these candidates are tested.
+        @param x, y the Boundaries (or TierTimes) to compare
+        @return (xIndexes, yIndexes) the indexes of the pairs, sorted by x then y
+    """
+    empty = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+    if len(x) == 0 or len(y) == 0:
+        return empty
+    order = np.argsort(y.starts, kind='mergesort')
+    (yStarts, yEnds) = (y.starts[order], y.ends[order])
+    (yStartsRadius, yEndsRadius) = (y.starts_radius[order], y.ends_radius[order])
+    # candidates: y.start - tolerance <= x.end and max(previous y.end) + tolerance >= x.start
+    tolerance = max(x.starts_radius.max(), x.ends_radius.max()) + max(yStartsRadius.max(), yEndsRadius.max())
+    tolerance += 1e-9 * max(1., abs(yEnds).max(), abs(x.ends).max()) # rounding errors
+    lo = np.searchsorted(np.maximum.accumulate(yEnds), x.starts - tolerance, 'left')
+    hi = np.searchsorted(yStarts, x.ends + tolerance, 'right')
+    counts = np.maximum(hi - lo, 0)
+    if counts.sum() == 0:
+        return empty
+    xIndexes = np.repeat(np.arange(len(x)), counts)
+    js = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    # convergent (as TimePoint): x.start <= y.end and y.start <= x.end
+    ok = ((x.starts[xIndexes] - yEnds[js]) <= (x.starts_radius[xIndexes] + yEndsRadius[js])) \
+        & ((yStarts[js] - x.ends[xIndexes]) <= (yStartsRadius[js] + x.ends_radius[xIndexes]))
+    (xIndexes, yIndexes) = (xIndexes[ok], order[js[ok]])
+    pairsOrder = np.lexsort((yIndexes, xIndexes))
+    return (xIndexes[pairsOrder], yIndexes[pairsOrder])
 
-def TimePointSub(timePoint,value,minValue=0.):
-    res = timePoint.Copy()
-    if (value<0.):  # case of negative value => use the radius
-        value = timePoint.GetRadius()
-        res.SetRadius(0.);
-    midpoint = timePoint.GetMidpoint() - value
-    if ((minValue is not None) and (midpoint<minValue)):
-        midpoint=minValue
-    res.SetMidpoint(midpoint)
-    return res;
+def oneToOnePairs(x, y, xIndexes, yIndexes):
+    """ Keep a one-to-one subset of x/y pairs: the pairs are taken greedily
+        from the closest (midpoints) to the farthest, skipping the ones
+        with an x or y boundary already taken
+        @param x, y the Boundaries (or TierTimes) of the pairs
+        @param xIndexes, yIndexes   the pairs, see equalsPairs()
+        @return (xIndexes, yIndexes) the kept pairs, sorted by x then y
+    """
+    distances = np.abs((x.starts[xIndexes] + x.ends[xIndexes]) - (y.starts[yIndexes] + y.ends[yIndexes])) / 2.
+    xTaken = set(); yTaken = set(); kept = []
+    for i in np.lexsort((yIndexes, xIndexes, distances)):
+        (xi, yi) = (xIndexes[i], yIndexes[i])
+        if xi not in xTaken and yi not in yTaken:
+            xTaken.add(xi); yTaken.add(yi); kept.append(i)
+    kept = np.array(sorted(kept), dtype=np.intp)
+    return (xIndexes[kept], yIndexes[kept])
 
-def MidPoint(p1,p2):
-    res = p1.Copy();
-    midpoint = (p1.GetMidpoint() + p2.GetMidpoint()) / 2.
-    res.SetMidpoint(midpoint)
-    return res;
+def boundariesAgreement(bounds, radii):
+    """ Compare the boundaries of each pair of tiers, with various radius
+        The boundaries arrays are computed once (see Boundaries), then only
+        the radius change (see Boundaries.withRadius). The boundaries at the
+        same time (see equalsPairs) are matched one-to-one (see oneToOnePairs),
+        then an x boundary is never counted for two y boundaries (b.e. the end
+        and the begin of two adjacent annotations), nor the reverse.
+        @param bounds   the (points) Boundaries of each tier
+        @param radii    the boundaries points radius
+        @return a dict (radius, x, y) => (x boundaries matched, x boundaries, y boundaries matched, y boundaries)
+            for each pair of tiers x != y (indexes in bounds), see agreementScores()
+    """
+    counts = {}
+    for radius in radii:
+        rbounds = [b.withRadius(radius) for b in bounds]
+        for x in range(len(rbounds)):
+            for y in range(x + 1, len(rbounds)):
+                (xIndexes, yIndexes) = oneToOnePairs(rbounds[x], rbounds[y], *equalsPairs(rbounds[x], rbounds[y]))
+                matched = len(xIndexes)
+                counts[(radius, x, y)] = (matched, len(rbounds[x]), matched, len(rbounds[y]))
+                counts[(radius, y, x)] = (matched, len(rbounds[y]), matched, len(rbounds[x]))
+    return counts
 
-def annotBegin(annot,orValue=0.):
-    return annot.GetLocation().GetBegin() if annot is not None else orValue;
+def agreementScores(xMatched, xSize, yMatched, ySize):
+    """ The precision, recall and F1 of x boundaries, compared to the y (reference) boundaries
+        i.e. the part of x boundaries at the same time than an y boundary, the part of
+        y boundaries at the same time than an x boundary, and their harmonic mean
+    """
+    precision = float(xMatched) / xSize if xSize else 0.
+    recall = float(yMatched) / ySize if ySize else 0.
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.
+    return (precision, recall, f1)
 
-def annotEnd(annot,orValue=0.):
-    return annot.GetLocation().GetEnd() if annot is not None else orValue;
+def printAgreement(prefix, names, radii, counts):
+    """ Print the agreement scores of each pair of tiers, then the F1 matrix, for each radius
+        @param counts   see boundariesAgreement()
+    """
+    width = max([len(name) for name in names] + [6])
+    for radius in radii:
+        print("%s Agreement with radius=%.3fs (precision/recall of the 1st tier, compared to the 2nd one):" % (prefix, radius))
+        for x in range(len(names)):
+            for y in range(x + 1, len(names)):
+                (xMatched, xSize, yMatched, ySize) = counts[(radius, x, y)]
+                (precision, recall, f1) = agreementScores(xMatched, xSize, yMatched, ySize)
+                print("%s   '%s' VS '%s': precision=%.3f (%d/%d) recall=%.3f (%d/%d) F1=%.3f" % (prefix
+                    , names[x], names[y], precision, xMatched, xSize, recall, yMatched, ySize, f1))
+        print("%s F1 matrix with radius=%.3fs:" % (prefix, radius))
+        print("%s   %s %s" % (prefix, " " * width, " ".join(name.rjust(width) for name in names)))
+        for x in range(len(names)):
+            print("%s   %s %s" % (prefix, names[x].ljust(width), " ".join(
+                ("%.3f" % (agreementScores(*counts[(radius, x, y)])[2] if x != y else 1.)).rjust(width) for y in range(len(names)))))
 
 def annotHasLabel(annot,noneValue=False):
     if (annot is None):
         return noneValue;
     return len(annot.GetLabel().GetValue())>0;
 
-def nextOrNone(it,stopValue=None):
-    """ Get the next value of an iterator or stopValue
-    """
-    try:
-        return it.next();
-    except StopIteration:
-        return stopValue;
-
 
 # ----------------------------------------------------------------------------
 def process_files(files, opts):
@@ -300,58 +440,105 @@ def process_files(files, opts):
         @param files the file(s) to process
     """
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
+    if not opts.agreement_radii:
+        sppas_tools.processFiles(process_file, files, opts)
+        return;
+    # agreement mode: sum the counts of all the files
+    total = {}; counted = []
+    def add_counts(f, counts):
+        if counts is None:  # tier not found (or failed)
+            return
+        counted.append(f)
+        for (key, values) in counts.items():
+            total[key] = tuple(np.add(total.get(key, (0, 0, 0, 0)), values).tolist())
+    sppas_tools.processFiles(process_agreement, files, opts, add_counts)
+    if len(files) > 1:
+        if not counted:
+            print("[all files] Any file with all the tiers, no agreement")
+            return
+        print("[all files] Agreement of %d file(s) (of %d)" % (len(counted), len(files)))
+        printAgreement("[all files]", opts.tiers_names, opts.agreement_radii, total)
+
+def process_file(f, opts):
+    """ Process one file
+        @param f the file to process
+    """
     from annotationdata import Transcription, Tier  #, TimePoint, TimeInterval, Label, Annotation
-    for f in files:
-        print("[%s] Loading annotation file..." % f)
-        # Read an annotated file
-        trs = annotationdata.aio.read(f)
-        print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
+    print("[%s] Loading annotation file..." % f)
+    # Read an annotated file
+    trs = annotationdata.aio.read(f)
+    print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
 
-        # Prepare the output Transcription
-        destTrs = trs; destAppendProcessed=False;   # default/'all' => work directly on trs
-        if (opts.keep_tiers.startswith('process')):
-            destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
-            destAppendProcessed=True; # append processed tiers
-        elif ((opts.keep_tiers == 'any') or opts.keep_tiers.startwith('bound')):
-            destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
-            
-        # Look for the tier to process
-        equalsRefBoundTier = None
-        for tier_name in opts.tiers_names:
-            tier = sppas_tools.tierFind(trs, tier_name)
-            if tier is None:
-                print("[%s] Any tier with name similar to '%s' ;-(" %  (f, opts.tier_name))
-                print("[%s] Tiers are : %s" % (f, 
-                    ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
-                    ))
-                break;
-            print("[%s] Searched tier '%s' has %d annotations" % (f, tier.GetName(), tier.GetSize()))
-            if (destAppendProcessed):
-                destTrs.Append(tier);
-            # Create the Boundaries tier
-            boundName = opts.out_tier_format.format(tier_name);
-            boundTier = Tier(boundName);
-            bounds = boundaries(tier, opts.radius, opts.bound_type, trs.GetMinTime(), trs.GetMaxTime(), opts.begin_format, opts.end_format);
-            for bound in bounds:
-                boundTier.Append(bound);
-            print("[%s] Boundaries tier '%s' has %d annotations" % (f, boundTier.GetName(), boundTier.GetSize()))
-            destTrs.Append(boundTier);
-            # Create the 'equals' tier
-            if (opts.equals_tier):
-                if (tier_name == opts.tiers_names[0]): # first => reference
-                    equalsRefBoundTier = boundTier
-                else:
-                    equalsTier = filterEquals(boundTier, equalsRefBoundTier, opts.bound_type, opts.equals_label_format)
-                    equalsName = opts.equals_tier_format.format(tier_name, opts.tiers_names[0]);
-                    equalsTier.SetName(equalsName);
-                    print("[%s] Equals tier '%s' has %d annotations" % (f, equalsTier.GetName(), equalsTier.GetSize()))
-                    destTrs.Append(equalsTier)
-        # Saving file
-        (root, ext) = os.path.splitext(f)
-        of = opts.out_file_format.format(root,"+".join(opts.tiers_names)) + ext
-        print("[%s] Saving annotations into %s" % (f, of))
-        annotationdata.aio.write(of, destTrs)
+    # Prepare the output Transcription
+    destTrs = trs; destAppendProcessed=False;   # default/'all' => work directly on trs
+    if (opts.keep_tiers.startswith('process')):
+        destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
+        destAppendProcessed=True; # append processed tiers
+    elif ((opts.keep_tiers == 'any') or opts.keep_tiers.startwith('bound')):
+        destTrs = Transcription(trs.GetName(), trs.GetMinTime(), trs.GetMaxTime()); # empty copy of trs
         
+    # Look for the tier to process
+    equalsRefBoundTiers = []   # the (previous) boundaries tiers to compare with, (tier name, boundaries tier)
+    for tier_name in opts.tiers_names:
+        tier = sppas_tools.tierFind(trs, tier_name)
+        if tier is None:
+            print("[%s] Any tier with name similar to '%s' ;-(" %  (f, opts.tier_name))
+            print("[%s] Tiers are : %s" % (f, 
+                ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
+                ))
+            break;
+        print("[%s] Searched tier '%s' has %d annotations" % (f, tier.GetName(), tier.GetSize()))
+        if (destAppendProcessed):
+            destTrs.Append(tier);
+        # Create the Boundaries tier
+        boundName = opts.out_tier_format.format(tier_name);
+        boundTier = Tier(boundName);
+        bounds = boundaries(tier, opts.radius, opts.bound_type, trs.GetMinTime(), trs.GetMaxTime(), opts.begin_format, opts.end_format);
+        for bound in bounds:
+            boundTier.Append(bound);
+        print("[%s] Boundaries tier '%s' has %d annotations" % (f, boundTier.GetName(), boundTier.GetSize()))
+        destTrs.Append(boundTier);
+        # Create the 'equals' tier
+        if (opts.equals_tier or opts.equals_all_pairs):
+            for (refName, refBoundTier) in equalsRefBoundTiers:
+                equalsTier = filterEquals(boundTier, refBoundTier, opts.bound_type, opts.equals_label_format)
+                equalsName = opts.equals_tier_format.format(tier_name, refName);
+                equalsTier.SetName(equalsName);
+                print("[%s] Equals tier '%s' has %d annotations" % (f, equalsTier.GetName(), equalsTier.GetSize()))
+                destTrs.Append(equalsTier)
+            if opts.equals_all_pairs or not equalsRefBoundTiers: # first => reference
+                equalsRefBoundTiers.append((tier_name, boundTier))
+    # Saving file
+    (root, ext) = os.path.splitext(f)
+    of = opts.out_file_format.format(root,"+".join(opts.tiers_names)) + ext
+    print("[%s] Saving annotations into %s" % (f, of))
+    annotationdata.aio.write(of, destTrs)
+    
+def process_agreement(f, opts):
+    """ Process one file in the agreement mode
+        @param f the file to process
+        @return the agreement counts, see boundariesAgreement()
+    """
+    print("[%s] Loading annotation file..." % f)
+    # Read an annotated file
+    trs = annotationdata.aio.read(f)
+    print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
+    # The boundaries (points) of each tier
+    bounds = []
+    for tier_name in opts.tiers_names:
+        tier = sppas_tools.tierFind(trs, tier_name)
+        if tier is None:
+            print("[%s] Any tier with name similar to '%s' ;-(" %  (f, tier_name))
+            print("[%s] Tiers are : %s" % (f, 
+                ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
+                ))
+            return;
+        print("[%s] Searched tier '%s' has %d annotations" % (f, tier.GetName(), tier.GetSize()))
+        bounds.append(Boundaries(tier, -1, 'point'))
+    counts = boundariesAgreement(bounds, opts.agreement_radii)
+    printAgreement("[%s]" % f, opts.tiers_names, opts.agreement_radii, counts)
+    return counts
+    
 # ----------------------------------------------------------------------------
 # --- Main stuffs
 # ----------------------------------------------------------------------------
@@ -369,6 +556,12 @@ def main():
         print("ERROR: at least one tier-name to process is required", file=sys.stderr)
         parser.print_help()
         exit(1)
+    if opts.agreement_radii: # agreement radius (without duplicates)
+        opts.agreement_radii = [ radius for radii in opts.agreement_radii for radius in radii ]
+        opts.agreement_radii = [ radius for i, radius in enumerate(opts.agreement_radii) if radius not in opts.agreement_radii[:i] ]
+        if [ radius for radius in opts.agreement_radii if radius < 0 ] or len(opts.tiers_names) < 2:
+            print("ERROR: the agreement mode requires non-negative radius and at least two tiers", file=sys.stderr)
+            exit(1)
     sppas_tools.load_sppas(opts);
     process_files(opts.files, opts)
 
@@ -10,6 +10,7 @@
 from __future__ import print_function   # print to file/stderr
 import os, argparse
 import re
+import time
 
 # work in UTF-8
 import sys
@@ -22,7 +23,9 @@ import sppas_tools
 # script options
 opts = argparse.Namespace(
     files=[],
-    to_ext="eaf"
+    to_ext="eaf",
+    to_exts=None, # convertion formats extensions (option -t, default: [to_ext])
+    force=False, # convert even if the destination file is up to date
     )
 
 # ----------------------------------------------------------------------------
@@ -31,10 +34,16 @@ opts = argparse.Namespace(
 
 parser = argparse.ArgumentParser(description='Convert file(s) to another format')
 # to_ext
-parser.add_argument("-t", "--to", dest='to_ext'
-    , help='convertion format extension (eaf=ELAN, ...)'
+parser.add_argument("-t", "--to", dest='to_exts', action='append'
+    , type=lambda value: [ ext.strip().lstrip('.') for ext in value.split(',') if ext.strip() ]
+    , help='convertion format extension (eaf=ELAN, ...).'
+        +' Repeat the option, or give a comma separated list, to convert to various formats (e.g. eaf,TextGrid,csv)'
     , metavar='<ext>'
     )
+# force
+parser.add_argument("-f", "--force", dest='force', action='store_true'
+    , help='convert even if the destination file is newer than the source file'
+    )
 # files
 parser.add_argument("files", nargs='+'
     , help="file(s) to process"
@@ -42,6 +51,10 @@ parser.add_argument("files", nargs='+'
     )
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: jobs
+sppas_tools.parserAddJobsArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
@@ -54,18 +67,79 @@ def process_files(files, opts):
         @param files the file(s) to process
     """
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
+    start = time.time()
+    results = sppas_tools.processFiles(process_file, files, opts)
+    # Summary
+    summary = dict((status, [0, 0.]) for status in ('converted', 'skipped', 'failed'))
+    failed = []
+    for (f, result) in zip(files, results):
+        (status, duration) = result if result is not None else ('failed', 0.)
+        summary[status][0] += 1; summary[status][1] += duration
+        if status == 'failed':
+            failed.append(f)
+    print("Converted: %d file(s) in %.3fs, skipped: %d file(s), failed: %d file(s) (total: %.3fs)" % (
+        summary['converted'][0], summary['converted'][1], summary['skipped'][0], summary['failed'][0], time.time() - start))
+    if failed:
+        print("Failed file(s): %s" % ", ".join(failed), file=sys.stderr)
+
+def process_file(f, opts):
+    """ Process one file
+        The file is read once (if any destination needs to be converted) and the
+        destination files are written concurrently (a thread per format).
+        @param f the file to process
+        @return (status, duration) with status 'converted', 'skipped' or 'failed' (if any destination failed)
+    """
     #from annotationdata import Transcription
-    for f in files:
-        dest = re.sub(r'\.[^.]+$', ".%s" % opts.to_ext, f);
+    start = time.time()
+    dests = []
+    for to_ext in opts.to_exts:
+        dest = re.sub(r'\.[^.]+$', ".%s" % to_ext, f);
         if dest == f:
             print("[%s] Destination file is the same '%s'" % (f,dest))
-            continue
+        elif not opts.force and isUpToDate(dest, f):
+            print("[%s] Destination file '%s' is up to date" % (f,dest))
+        else:
+            dests.append(dest)
+    if not dests:
+        return ('skipped', time.time() - start)
+    try:
         print("[%s] Loading annotation file..." % f)
         # Read an annotated file, put content in a Transcription object.
         trs = annotationdata.aio.read(f)
+    except Exception as e:
+        print("[%s] (!) Convertion failed: %s" % (f, e), file=sys.stderr)
+        return ('failed', time.time() - start)
+    # Write the Transcription object (the writers only read it)
+    if len(dests) > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(len(dests))
+        try:
+            errors = pool.map(lambda dest: writeTranscription(f, dest, trs), dests)
+        finally:
+            pool.close(); pool.join()
+    else:
+        errors = [ writeTranscription(f, dests[0], trs) ]
+    return ('failed' if any(errors) else 'converted', time.time() - start)
+
+def writeTranscription(f, dest, trs):
+    """ Write the convertion of the file f into dest
+        @return the error (if any)
+    """
+    try:
         print("[%s] Writting convertion to %s" % (f,dest))
-        # Write the Transcription object.
         annotationdata.aio.write(dest, trs)
+    except Exception as e:
+        print("[%s] (!) Convertion to %s failed: %s" % (f, dest, e), file=sys.stderr)
+        if os.path.exists(dest):
+            os.remove(dest) # an incomplete destination file would be up to date
+        return e
+
+def isUpToDate(dest, src):
+    """ Is the dest file newer (or as old as) the src file ? (i.e. 'make' rule) """
+    try:
+        return os.path.getmtime(dest) >= os.path.getmtime(src)
+    except OSError:
+        return False # missing file
         
 
 # ----------------------------------------------------------------------------
@@ -81,6 +155,7 @@ def main():
         print("ERROR: at least one file to process is required", file=sys.stderr)
         parser.print_help()
         exit(1)
+    opts.to_exts = [ to_ext for to_exts in opts.to_exts for to_ext in to_exts ] if opts.to_exts else [ opts.to_ext ]
     sppas_tools.load_sppas(opts);
     process_files(opts.files, opts)
 
@@ -10,6 +10,8 @@
 from __future__ import print_function   # print to file/stderr
 import os, argparse
 import re
+import csv
+from cStringIO import StringIO
 
 # work in UTF-8
 import sys
@@ -19,60 +21,244 @@ sys.setdefaultencoding('utf-8')
 # SPPAS tools
 import sppas_tools
 
+# NumPy (imported after sppas_tools, so --startup-profile reports it)
+import numpy as np
+
 # script options
 opts = argparse.Namespace(
     files=[],
     tier_name='Seq. réparation',
+    tiers_names=[], # tiers to extract (default: [tier_name])
+    output=None, # a single CSV file for all the files (default: one CSV per file and tier)
+    corpus=None, # a single columnar (NumPy .npz) file for all the files
+    row_group_size=100000, # number of rows of the corpus row groups
     )
 
 # ----------------------------------------------------------------------------
 # --- Script arguments
 # ----------------------------------------------------------------------------
 
-parser = argparse.ArgumentParser(description='Extract a tier into a CSV file')
+parser = argparse.ArgumentParser(description='Extract tier(s) into CSV file(s)')
 # files
 parser.add_argument("files", nargs='+'
     , help="file(s) to process"
     , metavar='<file>'
     )
 # tier_name
-parser.add_argument("-t", "--tier", "--tier-name", dest='tier_name'
-    , help="tier to extract (default:'%s')"%opts.tier_name
+parser.add_argument("-t", "--tier", "--tier-name", action='append', dest='tiers_names'
+    , help="tier to extract (default:'%s'), repeat the option to extract various tiers"%opts.tier_name
     , metavar='<tier>'
     )
+# output
+parser.add_argument("-o", "--output", dest='output'
+    , help="write the tier(s) of all the files into this single CSV file"
+        " (default: one '<file>-<tier>.csv' file per file and tier)"
+    , metavar='<csv>'
+    )
+# corpus
+parser.add_argument("-c", "--corpus", dest='corpus'
+    , help="write the tier(s) of all the files into this single columnar file (a NumPy .npz archive),"
+        " see CorpusWriter"
+    , metavar='<npz>'
+    )
+parser.add_argument("--row-group-size", dest='row_group_size', type=int
+    , help="number of rows of the corpus row groups (default:%d)"%opts.row_group_size
+    , metavar='<rows>'
+    )
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: jobs
+sppas_tools.parserAddJobsArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
 # --- The real Work
 # ----------------------------------------------------------------------------
 
+CSV_HEADER = ('file', 'tier', 'begin', 'end', 'label')
+
+def writeTierRows(writer, fileId, tier):
+    """ Write the annotations of a tier as CSV rows (file, tier, begin, end, label)
+        @param writer   a csv.writer
+        @param fileId   the file column value
+        @param tier     the tier to write
+        @return the number of rows
+    """
+    name = tier.GetName()
+    count = 0
+    for annot in tier:
+        location = annot.GetLocation()
+        writer.writerow((fileId, name, location.GetBeginMidpoint(), location.GetEndMidpoint(), annot.GetLabel().GetValue()))
+        count += 1
+    return count;
+
+def tierColumns(tier):
+    """ Extract the annotations of a tier as columns
+        @return (tier name, begins, ends, radius, labels) with radius the biggest of the begin/end radius
+    """
+    locations = [annot.GetLocation() for annot in tier]
+    return (tier.GetName()
+        , [location.GetBeginMidpoint() for location in locations]
+        , [location.GetEndMidpoint() for location in locations]
+        , [max(location.GetBeginRadius(), location.GetEndRadius()) for location in locations]
+        , [annot.GetLabel().GetValue() for annot in tier]
+        );
+
+class CorpusWriter(object):
+    """ Write the annotations of various files and tiers into a single columnar file,
+        a NumPy .npz archive (i.e. a zip of .npy arrays, see numpy.load) with:
+          - 'rg<i>/<column>' : the columns of the i-th row group (of row_group_size rows)
+              file_id (int32), tier_id (int32), begin, end, radius (float64) and label (int32)
+          - 'files', 'tiers', 'labels' : the dictionaries of the file_id, tier_id and label columns
+          - 'row_groups' : the number of rows of each row group
+        Only one row group is kept in memory (see readCorpus() to load the whole columns).
+    """
+    COLUMNS = (('file_id', np.int32), ('tier_id', np.int32)
+        , ('begin', np.float64), ('end', np.float64), ('radius', np.float64), ('label', np.int32))
+
+    def __init__(self, filename, row_group_size=100000):
+        import zipfile
+        self.zip = zipfile.ZipFile(filename, 'w', zipfile.ZIP_STORED, allowZip64=True)
+        self.row_group_size = max(row_group_size, 1)
+        self.files = []
+        self.tiers = {}; self.labels = {};  # value => id
+        self.pending = dict((column, []) for (column, dtype) in self.COLUMNS)
+        self.pendingSize = 0
+        self.row_groups = []
+
+    def addFile(self, fileName):
+        """ @return the file id """
+        self.files.append(fileName)
+        return len(self.files) - 1;
+
+    def addTier(self, fileId, columns):
+        """ Add the annotations of a tier
+            @param fileId   the file id (see addFile())
+            @param columns  the tier columns (see tierColumns())
+        """
+        (name, begins, ends, radius, labels) = columns
+        count = len(begins)
+        tierId = self.tiers.setdefault(name, len(self.tiers))
+        self.pending['file_id'].append(np.repeat(np.int32(fileId), count))
+        self.pending['tier_id'].append(np.repeat(np.int32(tierId), count))
+        self.pending['begin'].append(np.asarray(begins, dtype=np.float64))
+        self.pending['end'].append(np.asarray(ends, dtype=np.float64))
+        self.pending['radius'].append(np.asarray(radius, dtype=np.float64))
+        self.pending['label'].append(np.array([self.labels.setdefault(label, len(self.labels)) for label in labels], dtype=np.int32))
+        self.pendingSize += count
+        if self.pendingSize >= self.row_group_size:
+            self.flush()
+
+    def flush(self, last=False):
+        """ Write the complete row groups (and the incomplete one if last) """
+        if not self.pendingSize:
+            return;
+        columns = dict((column, np.concatenate(self.pending[column]).astype(dtype)) for (column, dtype) in self.COLUMNS)
+        start = 0
+        while (self.pendingSize - start >= self.row_group_size) or (last and start < self.pendingSize):
+            end = min(start + self.row_group_size, self.pendingSize)
+            for (column, dtype) in self.COLUMNS:
+                self._writeArray("rg%05d/%s" % (len(self.row_groups), column), columns[column][start:end])
+            self.row_groups.append(end - start)
+            start = end
+        for (column, dtype) in self.COLUMNS:
+            self.pending[column] = [ columns[column][start:] ]
+        self.pendingSize -= start
+
+    def close(self):
+        """ Write the last row group and the dictionaries """
+        self.flush(last=True)
+        self._writeArray('files', np.array(self.files, dtype=unicode))
+        for (name, values) in (('tiers', self.tiers), ('labels', self.labels)):
+            self._writeArray(name, np.array(sorted(values, key=values.get), dtype=unicode))
+        self._writeArray('row_groups', np.array(self.row_groups, dtype=np.int64))
+        self.zip.close()
+
+    def _writeArray(self, name, array):
+        buf = StringIO()
+        np.lib.format.write_array(buf, np.ascontiguousarray(array))
+        self.zip.writestr(name + '.npy', buf.getvalue())
+
+def readCorpus(filename):
+    """ Read a corpus file (see CorpusWriter)
+        @return a dict with the whole columns (concatenated row groups) and the dictionaries
+    """
+    with np.load(filename) as data:
+        corpus = dict((name, data[name]) for name in ('files', 'tiers', 'labels', 'row_groups'))
+        for (column, dtype) in CorpusWriter.COLUMNS:
+            corpus[column] = np.concatenate([ data["rg%05d/%s" % (i, column)] for i in range(len(corpus['row_groups'])) ] or [ np.empty(0, dtype=dtype) ])
+    return corpus;
+
 # ----------------------------------------------------------------------------
 def process_files(files, opts):
     """ Process each file
         @param files the file(s) to process
     """
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
-    from annotationdata import Transcription
-    for f in files:
-        print("[%s] Loading annotation file..." % f)
-        # Read an annotated file, put content in a Transcription object.
-        trs = annotationdata.aio.read(f)
-        print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
-        tier = sppas_tools.tierFind(trs, opts.tier_name)
+    if opts.corpus:
+        # a single columnar file: each file columns are appended (in the files order) as soon as the file is processed
+        print("Saving tier(s) into %s" % opts.corpus)
+        writer = CorpusWriter(opts.corpus, opts.row_group_size)
+        def append_columns(f, tiersColumns):
+            if tiersColumns is not None:
+                fileId = writer.addFile(f)
+                for columns in tiersColumns:
+                    writer.addTier(fileId, columns)
+        try:
+            sppas_tools.processFiles(process_file, files, opts, append_columns)
+        finally:
+            writer.close()
+        return;
+    if not opts.output:
+        sppas_tools.processFiles(process_file, files, opts)
+        return;
+    # a single CSV: each file rows are appended (in the files order) as soon as the file is processed
+    print("Saving tier(s) into %s" % opts.output)
+    with open(opts.output, 'wb') as out:
+        csv.writer(out).writerow(CSV_HEADER)
+        def append_rows(f, rows):
+            if rows:
+                out.write(rows)
+        sppas_tools.processFiles(process_file, files, opts, append_rows)
+
+def process_file(f, opts):
+    """ Process one file
+        @param f the file to process
+        @return the CSV rows if opts.output is set, the tiers columns if opts.corpus is set (see process_files)
+    """
+    print("[%s] Loading annotation file..." % f)
+    # Read an annotated file, put content in a Transcription object.
+    trs = annotationdata.aio.read(f)
+    print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
+    rows = StringIO() if opts.output else None
+    tiersColumns = []
+    for tier_name in opts.tiers_names:
+        tier = sppas_tools.tierFind(trs, tier_name)
         if tier is None:
-            print("[%s] Any tier with name similar to '%s' ;-(" %  (f, opts.tier_name))
+            print("[%s] Any tier with name similar to '%s' ;-(" %  (f, tier_name))
             print("[%s] Tiers are : %s" % (f, 
                 ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
                 ))
-            break;
+            continue;
         print("[%s] Searched tier '%s' has %d annotations" % (f, tier.GetName(), tier.GetSize()))
-        csv = Transcription()
-        csv.Append(tier)
-        of = re.sub(r"\.\w+$", "-"+opts.tier_name+".csv", f)
+        if opts.corpus:
+            tiersColumns.append(tierColumns(tier))
+            continue;
+        if rows is not None:
+            writeTierRows(csv.writer(rows), f, tier)
+            continue;
+        of = re.sub(r"\.\w+$", "-"+tier_name+".csv", f)
         print("[%s] Saving tier into %s" % (f, of))
-        annotationdata.aio.write(of, csv)
+        with open(of, 'wb') as out:
+            writer = csv.writer(out)
+            writer.writerow(CSV_HEADER)
+            writeTierRows(writer, f, tier)
+    if opts.corpus:
+        return tiersColumns;
+    if rows is not None:
+        return rows.getvalue();
         
 
 # ----------------------------------------------------------------------------
@@ -88,6 +274,11 @@ def main():
         print("ERROR: at least one file to process is required", file=sys.stderr)
         parser.print_help()
         exit(1)
+    if not opts.tiers_names:
+        opts.tiers_names = [ opts.tier_name ]
+    if opts.output and opts.corpus:
+        print("ERROR: --output and --corpus can't be used together", file=sys.stderr)
+        exit(1)
     sppas_tools.load_sppas(opts);
     process_files(opts.files, opts)
 
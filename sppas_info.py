@@ -22,6 +22,7 @@ import sppas_tools
 # script options
 opts = argparse.Namespace(
     files=[],
+    full_read=False, # always use the SPPAS reader (instead of the fast tiers information reader)
     )
 
 # ----------------------------------------------------------------------------
@@ -34,8 +35,16 @@ parser.add_argument("files", nargs='+'
     , help="file(s) to process"
     , metavar='<file>'
     )
+# full read
+parser.add_argument("--full", "--full-read", dest='full_read', action='store_true'
+    , help="always read the files with SPPAS (by default, EAF, TextGrid and XRA files are only scanned for their tiers information)"
+    )
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: jobs
+sppas_tools.parserAddJobsArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
@@ -48,17 +57,49 @@ def process_files(files, opts):
         @param files the file(s) to process
     """
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
-    from annotationdata import Transcription
-    for f in files:
-        print("[%s] Loading annotation file..." % f)
+    inventoryFile = sppas_tools.inventoryFilename(opts)
+    if not inventoryFile:
+        sppas_tools.processFiles(process_file, files, opts)
+        return;
+    # the updated files information are stored (by the main process) into the inventory
+    inventory = sppas_tools.getInventory(inventoryFile)
+    def update_inventory(f, result):
+        if result is not None:
+            inventory.update(*result)
+    try:
+        sppas_tools.processFiles(process_file, files, opts, update_inventory)
+    finally:
+        inventory.commit()
+
+def process_file(f, opts):
+    """ Process one file
+        @param f the file to process
+        @return (file key, tiers information, times) to update the inventory (if any), see CorpusInventory.update()
+    """
+    print("[%s] Loading annotation file..." % f)
+    inventoryFile = sppas_tools.inventoryFilename(opts)
+    fileKey = sppas_tools.CorpusInventory.fileKey(f) if inventoryFile else None
+    # Look for the up to date information into the inventory
+    known = sppas_tools.getInventory(inventoryFile).lookup(f) if inventoryFile else None
+    if known is not None:
+        (tiersInfo, times) = known
+    else:
+        # Only scan the tiers information (if the format allows it)
+        tiersInfo = sppas_tools.readTiersInfo(f) if not opts.full_read else None
+        times = sppas_tools.tiersInfoTimes(tiersInfo) if tiersInfo else None
+    if times is None:
         # Read an annotated file, put content in a Transcription object.
         trs = annotationdata.aio.read(f)
-        print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
-        if True:
-            print("[%s] Tiers are : %s" % (f, 
-                ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
-                ))
-        print("[%s] Min/Max times: [ %s ; %s ]" % (f, trs.GetMinTime(), trs.GetMaxTime()))
+        tiersInfo = sppas_tools.transcriptionTiersInfo(trs)
+        times = (trs.GetMinTime(), trs.GetMaxTime())
+    print("[%s] Number of tiers:%d" % (f, len(tiersInfo)))
+    if True:
+        print("[%s] Tiers are : %s" % (f, 
+            ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, name) for i, (name, size, begin, end) in enumerate(tiersInfo)])
+            ))
+    print("[%s] Min/Max times: [ %s ; %s ]" % (f, times[0], times[1]))
+    if fileKey is not None and known is None:
+        return (fileKey, tiersInfo, times);
         
 
 # ----------------------------------------------------------------------------
@@ -30,6 +30,7 @@ opts = argparse.Namespace(
     first_tiers=[], # list of tiers to put at the start of the output Transcription
     exclude_tiers=[], # list of tiers to remove of the output Transcription
     case_sensitive=True,
+    drop_duplicates=False, # remove the tiers with the same content (annotations) than a previous tier
     )
 
 # ----------------------------------------------------------------------------
@@ -66,14 +67,32 @@ parser.add_argument("-x", "--exclude-tiers", action='append', dest='exclude_tier
 parser.add_argument("-i", "--ignore-case", dest='case_sensitive', action='store_false'
     , help="Ignore case when looking for tier names"
     )
+# - drop duplicates
+parser.add_argument("-d", "--drop-duplicates", dest='drop_duplicates', action='store_true'
+    , help="Remove the tiers with the same annotations (times and labels) than a previous tier,"
+            +"\nwhatever their names"
+    )
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
 # --- The real Work
 # ----------------------------------------------------------------------------
 
+# ----------------------------------------------------------------------------
+def tierContent(tier):
+    """ The content of a tier, i.e. the sorted (begin, end, label) of its annotations
+        @return a (hashable) tuple
+    """
+    locations = [annot.GetLocation() for annot in tier]
+    return tuple(sorted(zip([location.GetBeginMidpoint() for location in locations]
+        , [location.GetEndMidpoint() for location in locations]
+        , [annot.GetLabel().GetValue() for annot in tier]
+        )))
+
 # ----------------------------------------------------------------------------
 def process_files(files, opts):
     """ Process all files
@@ -82,7 +101,24 @@ def process_files(files, opts):
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
     from annotationdata import Transcription, Tier  #, TimePoint, TimeInterval, Label, Annotation
     mergedTrs = None; firstFile = None;
-    for f in files:
+    excludedNames = set()   # the excluded tiers found
+    def isExcluded(tierName):
+        for name in opts.exclude_tiers or []:
+            if (name == tierName) if opts.case_sensitive else (name.lower() == tierName.lower()):
+                excludedNames.add(name)
+                return True
+        return False
+    contents = {}   # tier content => (first) merged tier with it (with --drop-duplicates)
+    def isDuplicate(tier):
+        """ Is the tier content the same than a merged tier ? (if not, add it) """
+        content = tierContent(tier)
+        if not content: return False  # keep the empty tiers
+        merged = contents.setdefault(content, tier)
+        if merged is not tier:
+            print("[duplicate] Remove tier '%s', same content than tier '%s'" % (tier.GetName(), merged.GetName()))
+            return True
+        return False
+    for f in sppas_tools.selectFiles(files, opts): # skip the files without the required tiers (inventory)
         print("[%s] Loading annotation file..." % f)
         # Read an annotated file, put content in a Transcription object.
         trs = annotationdata.aio.read(f)
@@ -92,45 +128,54 @@ def process_files(files, opts):
                 ''.join([ "{}[{}] '{}'".format("\n   " if (i % 4)==0 else ", ", i, t.GetName()) for i, t in enumerate(trs)])
                 ))
             print("[%s] Min/Max times: [ %s ; %s ]" % (f, trs.GetMinTime(), trs.GetMaxTime()))
-            # merge trs into mergedTrs
-            if mergedTrs is None:    # 1rst file => copy
-                mergedTrs = trs.Copy(); firstFile = f;
+            # merge trs into mergedTrs, moving its tiers (no copy)
+            if mergedTrs is None:    # 1rst file => the merged Transcription
+                mergedTrs = trs; firstFile = f;
+                for tierIndex in reversed(range(mergedTrs.GetSize())):
+                    if isExcluded(mergedTrs[tierIndex].GetName()):
+                        tier = sppas_tools.popTier(mergedTrs, tierIndex)
+                        print("[exclude] Remove tier '%s' in position %i" % (tier.GetName(), tierIndex))
+                if opts.drop_duplicates:
+                    duplicates = [tierIndex for (tierIndex, tier) in enumerate(mergedTrs) if isDuplicate(tier)]
+                    for tierIndex in reversed(duplicates):
+                        sppas_tools.popTier(mergedTrs, tierIndex)
             else:
                 # loop on tiers
-                for t in trs:
+                while trs.GetSize():
+                    t = trs.Pop(0)
+                    if isExcluded(t.GetName()):
+                        print("[%s] [exclude] Remove tier '%s'" % (f, t.GetName()))
+                        continue
                     # look if the tier is yet in the merge
-                    inmerge = mergedTrs.Find(trs.GetName(), opts.case_sensitive)
-                    if inmerge is None: # NO => append
-                        mergedTrs.Append(t)
-                    else:
+                    inmerge = sppas_tools.tierNameIndex(mergedTrs).find(t.GetName(), opts.case_sensitive)
+                    if inmerge is not None:
                         print("[%s] tier '%s' is already in the merged Transcription, ignore it" % (f, t.GetName()))
+                    elif opts.drop_duplicates and isDuplicate(t):
+                        continue
+                    else: # NO => append
+                        sppas_tools.appendTier(mergedTrs, t)
+            del trs # release the source (its tiers are moved)
         else:
             print("(!) Can't read '%s', skipped" % f)
     if mergedTrs is None:
         print("ERROR any merged Transcription")
         return
-    # Exclude tiers
-    if opts.exclude_tiers:
-        for tierName in opts.exclude_tiers:
-            tierIndex = mergedTrs.GetIndex(tierName, opts.case_sensitive)
-            if tierIndex < 0:
-                print("[exclude] (!) any tier named '%s'" % tierName)
-                continue
-            else:
-                tier = mergedTrs.Pop(tierIndex)
-                print("[exclude] Remove tier '%s' in position %i" % (tier.GetName(), tierIndex))
+    # Excluded tiers not found
+    for tierName in opts.exclude_tiers or []:
+        if tierName not in excludedNames:
+            print("[exclude] (!) any tier named '%s'" % tierName)
     # Reorder tiers
     if opts.first_tiers:
         index=0
         for tierName in opts.first_tiers:
-            tierIndex = mergedTrs.GetIndex(tierName, opts.case_sensitive)
+            tierIndex = sppas_tools.tierNameIndex(mergedTrs).index(tierName, opts.case_sensitive)
             if tierIndex < 0:
                 print("[reorder] (!) any tier named '%s'" % tierName)
                 continue
             elif tierIndex != index:
-                tier = mergedTrs.Pop(tierIndex)
+                tier = sppas_tools.popTier(mergedTrs, tierIndex)
                 print("[reorder] Move tier '%s' to position %i" % (tier.GetName(), index))
-                mergedTrs.Add(tier, index)
+                sppas_tools.addTier(mergedTrs, tier, index)
             index+=1
     # Saving file
     print("Number of tiers:%d" % mergedTrs.GetSize())
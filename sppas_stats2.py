@@ -10,7 +10,8 @@
 from __future__ import print_function   # print to file/stderr
 import os, argparse
 import re
-from collections import namedtuple, Counter
+from collections import namedtuple, Counter, OrderedDict
+from bisect import bisect_right
 
 # work in UTF-8
 import sys
@@ -20,9 +21,16 @@ sys.setdefaultencoding('utf-8')
 # SPPAS tools
 import sppas_tools
 
+# NumPy (imported after sppas_tools, so --startup-profile reports it)
+import numpy as np
+
 # script options
 opts = argparse.Namespace(
     files=[],
+    plan_file=None, # analysis plan (default to default_plan)
+    summary_file=None, # corpus summary (aggregated results) file, JSON or CSV (default to any)
+    add_summaries=[], # summary (JSON) files of previous runs to add to the corpus summary
+    output_format='text', # results output: 'text', 'jsonl' (JSON lines) or 'csv' (see SINKS)
     )
 
 # ----------------------------------------------------------------------------
@@ -31,12 +39,40 @@ opts = argparse.Namespace(
 
 parser = argparse.ArgumentParser(description='Statistics on input file(s)')
 # files
-parser.add_argument("files", nargs='+'
+parser.add_argument("files", nargs='*'
     , help="file(s) to process"
     , metavar='<file>'
     )
+# plan
+parser.add_argument("-p", "--plan", dest='plan_file'
+    , help="JSON (or YAML) file with the list of analyses to run (default: the full ACORFORMED analyses)."
+        +" Each analysis is an object with the 'process' name (intra, feedback_after, feedback_eyes, feedback_per_phases), the 'tiers' names and the other process arguments,"
+        +" b.e. {\"process\": \"feedback_after\", \"tiers\": [\"P-Feedback\", \"Vocabulaire\"], \"after_Max\": 1.0}"
+    , metavar='<file>'
+    )
+# summary
+parser.add_argument("-s", "--summary", dest='summary_file'
+    , help="Write the results of each file and their totals (counts, sums, sums of squares, min/max of the"
+        +" values, and labels counts) into this file: a JSON file, or a CSV file (.csv extension)"
+    , metavar='<file>'
+    )
+parser.add_argument("--add-summary", dest='add_summaries', action='append'
+    , help="Add the results of a (JSON) summary file, b.e. of an other run on a part of the corpus,"
+        +" to the summary (repeat the option for various files)"
+    , metavar='<json>'
+    )
+# output format
+parser.add_argument("-f", "--format", dest='output_format', choices=['text', 'jsonl', 'csv']
+    , help="Results output (default:%s): 'text' (human readable), 'jsonl' (one JSON object per result)"%opts.output_format
+        +" or 'csv' (one row per result field: file, analysis, index, record, field, value) ;"
+        +" with jsonl/csv, the progress messages are printed on stderr"
+    )
 # sppas_tools: sppas_dir/sppas_version
 sppas_tools.parserAddLoadSPPASArgument(parser);
+# sppas_tools: jobs
+sppas_tools.parserAddJobsArgument(parser);
+# sppas_tools: inventory/require_tiers
+sppas_tools.parserAddInventoryArgument(parser);
 
 
 # ----------------------------------------------------------------------------
@@ -49,67 +85,158 @@ def process_files(files, opts):
         @param files the file(s) to process
     """
     annotationdata.aio = sppas_tools.getAnnotationdataAio(); # import annotationdata.aio or annotationdata.io
-    
-    for f in files:
-        print("[%s] Loading annotation file..." % f)
-        # Read an annotated file, put content in a Transcription object.
-        trs = annotationdata.aio.read(f)
-        print("[%s] Number of tiers:%d" % (f, trs.GetSize()))
-      
-        # Compute the intra annotation delays
-        mVoc_proc_intra = process_intra(trs, 'Vocabulaire')
-        mFb_proc_intra = process_intra(trs, 'M-Feedback', perLabel=True)
-        # Compute the feedbacks per (interaction's) phases 
-        process_feedback_per_phases(trs, 'M-Feedback', 'Script')
-        pFb_proc_intra = process_intra(trs, 'P-Feedback', perLabel=True)
-        # Compute the feedbacks per (interaction's) phases 
-        process_feedback_per_phases(trs, 'P-Feedback', 'Script')
- 
-        
-        # Compute the intra Feedback/Eyes Direction relation
-        process_feedback_eyes(trs, 'M-Feedback', 'M-Regard')
-        process_feedback_eyes(trs, 'P-Feedback', 'P-Regard')
-        
-        # Compute the inter Feedback/Eyes Direction relation
-        process_feedback_eyes(trs, 'M-Feedback', 'P-Regard')
-        process_feedback_per_phases(trs, 'M-Feedback', 'P-Regard', most_common=True)
-        process_feedback_eyes(trs, 'P-Feedback', 'M-Regard')
-        process_feedback_per_phases(trs, 'P-Feedback', 'M-Regard', most_common=True)
-
-        # Compute Vocabulaire/P-Feedback relation
-        #pFb_mVoc_proc = process_pFb_mVoc(trs, 'P-Feedback', 'Vocabulaire', perLabel=True) # /!\ this create the P-fb-after-M-Voc tier
-        pFb_mVoc_proc = process_feedback_after(trs, 'P-Feedback', 'Vocabulaire', after_Max=1., perLabel=True, after_tierAppend=True
-            #, after_tierName="P-fb-after-M-Voc"
-            ); # /!\ this create the P-fb-after-M-Voc tier
-        # Other 'during/after' relations
-        process_feedback_after(trs, 'P-Feedback', 'M-Feedback', after_Max=3., perLabel=True);
-        process_feedback_after(trs, 'M-Feedback', 'P-Feedback', after_Max=3., perLabel=True);
-        # feedback/gestes
-        # - Dimensions
-        process_feedback_after(trs, 'P-Feedback', 'M-Dimensions', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'P-Feedback', 'M-Dimensions', most_common=True);
-        process_feedback_after(trs, 'M-Feedback', 'P-Dimensions', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'M-Feedback', 'P-Dimensions', most_common=True);
-        # - Affiliation lexicale
-        process_feedback_after(trs, 'P-Feedback', 'M-Affiliation lexicale', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'P-Feedback', 'M-Affiliation lexicale', most_common=True);
-        process_feedback_after(trs, 'M-Feedback', 'P-Affiliation lexicale', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'M-Feedback', 'P-Affiliation lexicale', most_common=True);
-        # - Lien geste/parole
-        process_feedback_after(trs, 'P-Feedback', 'M-Lien geste/parole', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'P-Feedback', 'M-Lien geste/parole', most_common=True);
-        process_feedback_after(trs, 'M-Feedback', 'P-Lien geste/parole', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'M-Feedback', 'P-Lien geste/parole', most_common=True);
-        # - Extra-communicative G
-        process_feedback_after(trs, 'P-Feedback', 'M-Extra-communicative G', after_Max=1., perLabel=True);
-        process_feedback_per_phases(trs, 'P-Feedback', 'M-Extra-communicative G', most_common=True);
-        process_feedback_after(trs, 'M-Feedback', 'P-Extra-communicatif G', after_Max=1., perLabel=True); # /!\ communicatif
-        process_feedback_per_phases(trs, 'M-Feedback', 'P-Extra-communicatif G', most_common=True); # /!\ communicatif
-
-        # Write the resulting file
-        of = re.sub(r"\.\w+$", "-fbAfter\g<0>", f)
-        print("[%s] Saving file into %s" % (f, of))
-        annotationdata.aio.write(of, trs)
+    sink.start()
+    log = lambda message: sink.message("{message}", message=message) # the skipped files messages
+    if not opts.summary_file:
+        sppas_tools.processFiles(process_file, files, opts, lambda f, result: None, log)
+        return;
+    # the results of each file (and of the previous runs)
+    summary = Summary()
+    for filename in opts.add_summaries or []:
+        summary.update(Summary.load(filename))
+    sppas_tools.processFiles(process_file, files, opts, summary.add, log)
+    sink.message("Saving the summary of {nb} file(s) into {filename}", nb=len(summary.files), filename=opts.summary_file)
+    summary.save(opts.summary_file)
+
+def process_file(f, opts):
+    """ Process one file
+        @param f the file to process
+        @return the Aggregates of the analyses
+    """
+    sink.startFile(f)
+    sink.message("[{file}] Loading annotation file...")
+    # Read an annotated file, put content in a Transcription object.
+    trs = annotationdata.aio.read(f)
+    sink.record("tiers", "[{file}] Number of tiers:{count:d}", count=trs.GetSize())
+  
+    # Run the analyses
+    aggregates = run_plan(trs, opts.plan)
+
+    # Write the resulting file
+    of = re.sub(r"\.\w+$", "-fbAfter\g<0>", f)
+    sink.message("[{file}] Saving file into {of}", of=of)
+    annotationdata.aio.write(of, trs)
+    return aggregates
+
+# ----------------------------------------------------------------------------
+# --- Analysis plan
+# ----------------------------------------------------------------------------
+
+# the full analyses (for the ACORFORMED files)
+default_plan = [
+    # Compute the intra annotation delays
+    {"process": "intra", "tiers": ["Vocabulaire"]},
+    {"process": "intra", "tiers": ["M-Feedback"], "perLabel": True},
+    # Compute the feedbacks per (interaction's) phases
+    {"process": "feedback_per_phases", "tiers": ["M-Feedback", "Script"]},
+    {"process": "intra", "tiers": ["P-Feedback"], "perLabel": True},
+    # Compute the feedbacks per (interaction's) phases
+    {"process": "feedback_per_phases", "tiers": ["P-Feedback", "Script"]},
+    # Compute the intra Feedback/Eyes Direction relation
+    {"process": "feedback_eyes", "tiers": ["M-Feedback", "M-Regard"]},
+    {"process": "feedback_eyes", "tiers": ["P-Feedback", "P-Regard"]},
+    # Compute the inter Feedback/Eyes Direction relation
+    {"process": "feedback_eyes", "tiers": ["M-Feedback", "P-Regard"]},
+    {"process": "feedback_per_phases", "tiers": ["M-Feedback", "P-Regard"], "most_common": True},
+    {"process": "feedback_eyes", "tiers": ["P-Feedback", "M-Regard"]},
+    {"process": "feedback_per_phases", "tiers": ["P-Feedback", "M-Regard"], "most_common": True},
+    # Compute Vocabulaire/P-Feedback relation (/!\ this create the "P-Feedback after Vocabulaire" tier)
+    {"process": "feedback_after", "tiers": ["P-Feedback", "Vocabulaire"], "after_Max": 1., "perLabel": True, "after_tierAppend": True},
+    # Other 'during/after' relations
+    {"process": "feedback_after", "tiers": ["P-Feedback", "M-Feedback"], "after_Max": 3., "perLabel": True},
+    {"process": "feedback_after", "tiers": ["M-Feedback", "P-Feedback"], "after_Max": 3., "perLabel": True},
+    ]
+# feedback/gestes
+for (mTier, pTier) in [('M-Dimensions', 'P-Dimensions')    # Dimensions
+        , ('M-Affiliation lexicale', 'P-Affiliation lexicale')    # Affiliation lexicale
+        , ('M-Lien geste/parole', 'P-Lien geste/parole')    # Lien geste/parole
+        , ('M-Extra-communicative G', 'P-Extra-communicatif G')    # Extra-communicative G (/!\ communicatif)
+        ]:
+    default_plan += [
+        {"process": "feedback_after", "tiers": ["P-Feedback", mTier], "after_Max": 1., "perLabel": True},
+        {"process": "feedback_per_phases", "tiers": ["P-Feedback", mTier], "most_common": True},
+        {"process": "feedback_after", "tiers": ["M-Feedback", pTier], "after_Max": 1., "perLabel": True},
+        {"process": "feedback_per_phases", "tiers": ["M-Feedback", pTier], "most_common": True},
+        ]
+
+def plan_processes():
+    """ The processes (by name) usable in a plan """
+    return {
+        'intra': process_intra,
+        'feedback_after': process_feedback_after,
+        'feedback_eyes': process_feedback_eyes,
+        'feedback_per_phases': process_feedback_per_phases,
+        }
+
+def load_plan(filename):
+    """
+    Load (and check) an analysis plan
+    @param filename: a JSON file, or a YAML file (.yml/.yaml extension, requires PyYAML)
+    @return: the list of analyses
+    """
+    with open(filename) as fd:
+        if re.search(r"\.ya?ml$", filename, re.I):
+            import yaml
+            plan = yaml.safe_load(fd)
+        else:
+            import json
+            plan = json.load(fd)
+    check_plan(plan)
+    return plan
+
+def check_plan(plan):
+    """
+    Check the analyses of a plan (process names and arguments)
+    @raise ValueError: if an analysis is invalid
+    """
+    import inspect
+    processes = plan_processes()
+    if not isinstance(plan, list):
+        raise ValueError("The plan must be a list of analyses")
+    for entry in plan:
+        if not isinstance(entry, dict) or entry.get('process') not in processes:
+            raise ValueError("Invalid analysis {} (known processes are: {})".format(entry, ", ".join(sorted(processes))))
+        args = inspect.getargspec(processes[entry['process']]).args
+        tiers = entry.get('tiers', [])
+        if not isinstance(tiers, list) or not all(isinstance(tier, basestring) for tier in tiers):
+            raise ValueError("The 'tiers' of the analysis {} must be a list of tiers names".format(entry))
+        if len(tiers) > len(args)-1:
+            raise ValueError("Too many tiers for the analysis {}".format(entry))
+        for key in entry:
+            if key not in ['process', 'tiers'] and key not in args[1+len(tiers):]:
+                raise ValueError("Unknown argument '{}' for the analysis {}".format(key, entry))
+
+def run_plan(trs, plan):
+    """
+    Run the analyses of a plan on a transcription
+    Identical analyses are run only once, and the analyses share the tiers lookups,
+    filters, indexes and durations (see tierFind, tierFilter, tierIndex, tierColumns)
+    @return: the Aggregates of all the analyses (see analysisName)
+    """
+    import json
+    processes = plan_processes()
+    dropMemos(trs)  # the tiers may have changed since a previous run
+    aggregates = Aggregates(); done = set();
+    for entry in plan:
+        key = json.dumps(entry, sort_keys=True)
+        if key in done:
+            continue
+        done.add(key)
+        kwargs = dict(entry)
+        process = processes[kwargs.pop('process')]
+        tiers = kwargs.pop('tiers', [])
+        name = analysisName(entry)
+        sink.startAnalysis(name)
+        result = process(trs, *tiers, **kwargs)
+        if result is not None:
+            aggregates.merge(result, name)
+    return aggregates
+
+def analysisName(entry):
+    """ The name of an analysis of a plan, b.e. "feedback_after(P-Feedback, Vocabulaire, after_Max=1.0)" """
+    args = list(entry.get('tiers', []))
+    args += [ "{}={}".format(key, value) for (key, value) in sorted(entry.items()) if key not in ['process', 'tiers'] ]
+    return "{}({})".format(entry['process'], ", ".join(args))
 
 # ----------------------------------------------------------------------------
 # --- sub-process methods
@@ -119,35 +246,40 @@ def process_intra(trs, tierName='Feedback', perLabel=False):
     Compute some intra-tier statistic
     @param trs: the annotation file or the tier
     @param tierName: the tier name
+    @return: the Aggregates (durations, delays, per label)
     """
     #from annotationdata.filter.delay_relations import IntervalsDelay
+    agg = Aggregates()
 
     res = namedtuple('Intra', "tier,end_start_delays,end_start_delays_stats,middle_middle_delays,middle_middle_delays_stats") # list of fields
     # (0) Get the tier
     res.tier = getTier(trs, tierName)
     if res.tier is None:
-        print("[{tierName}] No tier found ;-(".format(**locals()))
+        sink.message("[{tierName}] No tier found ;-(", tierName=tierName)
         return
     elif len(res.tier)==0:
-        print("[{tierName}] tier is empty".format(**locals()))
+        sink.message("[{tierName}] tier is empty", tierName=tierName)
         return
 
     # (1) Annotation, duration
     res.durations = durations(res.tier)
     res.duration_stats = stats(res.durations)
     res.radius = radius(res.tier) # max of all begin/end points radius
-    print("\t[{tierName}] {tier_len} annotations (time point radius:{res.radius})".format(tier_len=len(res.tier), **locals()))
-    print("\t  durations: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f}, {s.Max:.3f}]".format(s=res.duration_stats, **locals()))
+    sink.record("annotations", "\t[{tier}] {count} annotations (time point radius:{radius})"
+        , tier=tierName, count=len(res.tier), radius=res.radius)
+    sink.record("durations", "\t  durations: mean={stats.Mean:.3f}, std.dev.={stats.StdDev:.3f} [{stats.Min:.3f}, {stats.Max:.3f}]"
+        , stats=res.duration_stats)
+    agg.stats("durations", res.durations)
     # (2) Compute End-Start and Mid-Mid delays
-    intraDelays(res, "\t  ");
+    intraDelays(res, "\t  ", agg);
     # (3) Stats per label
     if perLabel:
         if len(res.tier)>1:
             statsPerLabel(res.tier, "\t\t", normLabelWithSep
                 , intraDelays 
-            );
+                , agg=agg);
     # return
-    return res
+    return agg
 
 def process_pFb_mVoc(trs, pFb_tierName='P-Feedback', mVoc_tierName='Vocabulaire', perLabel=False):
     """
@@ -195,7 +327,7 @@ def process_pFb_mVoc(trs, pFb_tierName='P-Feedback', mVoc_tierName='Vocabulaire'
     # => 
     pDuringAfter = AndPredicates(pStartStart, pStartEnd)
 
-    fMVoc = Filter(res.mVoc_tier); fPFb=Filter(res.pFb_tier);
+    fMVoc = tierFilter(res.mVoc_tier); fPFb=tierFilter(res.pFb_tier);
     rf = RelationFilter(pDuringAfter,fPFb,fMVoc)
     newtier = rf.Filter(annotformat="{x} [after({y})]")
     newtier.SetName(pFb_mVoc_tierName)
@@ -259,8 +391,9 @@ def process_pFb_mVoc(trs, pFb_tierName='P-Feedback', mVoc_tierName='Vocabulaire'
 def process_feedback_after(trs, pFb_tierName='P-Feedback', mVoc_tierName='Vocabulaire', after_Max=1., perLabel=False, after_tierAppend=False, after_tierName=None):
     """
     Process relation between (patient) feedbacks during/after another tier (b.e. Vocabulaire, ...)
+    @return: the Aggregates (delays and durations of the 'all', 'during' and 'after' groups)
     """
-    from annotationdata import Filter, RelationFilter#, Rel
+    from annotationdata import Filter#, Rel
     from annotationdata.filter.delay_relations import IntervalsDelay, AndPredicates
     
     #TODO? parameters
@@ -280,15 +413,15 @@ def process_feedback_after(trs, pFb_tierName='P-Feedback', mVoc_tierName='Vocabu
     # (a) 'Vocabulaire'
     res.mVoc_tier = sppas_tools.tierFind(trs, mVoc_tierName)
     if res.mVoc_tier is None:
-        print("\t[{mVoc_tierName}] No tier found ;-(".format(**locals()))
+        sink.message("\t[{mVoc_tierName}] No tier found ;-(", mVoc_tierName=mVoc_tierName)
         not_found+=1
     # (b) 'P-Feedback'
     res.pFb_tier = sppas_tools.tierFind(trs, pFb_tierName)
     if res.pFb_tier is None:
-        print("[{pFb_tierName}] No tier found ;-(".format(**locals()))
+        sink.message("[{pFb_tierName}] No tier found ;-(", pFb_tierName=pFb_tierName)
         not_found+=1
     if not_found:
-        print("[%s] %d unfound tier(s) => skip this file")
+        sink.message("[%s] %d unfound tier(s) => skip this file")
         return;
 
     # Combine the 2 tiers
@@ -305,54 +438,76 @@ def process_feedback_after(trs, pFb_tierName='P-Feedback', mVoc_tierName='Vocabu
     # => 
     pDuringAfter = AndPredicates(pStartStart, pStartEnd)
 
-    fMVoc = Filter(res.mVoc_tier); fPFb=Filter(res.pFb_tier);
-    rf = RelationFilter(pDuringAfter, fPFb, fMVoc)
+    # only the Y (Vocabulaire) overlapping [Xstart-after_Max, Xstart] can be linked to X
+    rf = relationFilter(pDuringAfter, "during/after({!r})".format(after_Max), res.pFb_tier, res.mVoc_tier
+        , lambda x: (annotBegin(x) - after_Max, annotBegin(x)), lookback=after_Max)
     newtier = rf.Filter(annotformat="{x} [after({y})]")
     res.pFb_mVoc_tier = newtier
     if after_tierAppend:
         newtier.SetName(after_tierName)
         trs.Append(newtier) # ?
-    print("\t[{after_tierName}] {tier_len} (of {pFb_len}) {pFb_tierName} during/after({after_Max}s) a {mVoc_tierName}".format(tier_len=len(res.pFb_mVoc_tier), pFb_len=len(res.pFb_tier), **locals()))
+    sink.record("feedbacks", "\t[{tier}] {count} (of {all}) {feedbacks} during/after({after_max}s) a {target}"
+        , tier=after_tierName, count=len(res.pFb_mVoc_tier), all=len(res.pFb_tier)
+        , feedbacks=pFb_tierName, after_max=after_Max, target=mVoc_tierName)
+    agg = Aggregates()
+    agg.counts("feedbacks", Counter({'during/after': len(res.pFb_mVoc_tier), 'all': len(res.pFb_tier)}))
     #-- # (1) Annotation, duration
     #-- res.pFb_mVoc_durations = durations(res.pFb_mVoc_tier)
     #-- res.pFb_mVoc_duration_stats = stats(res.pFb_mVoc_durations)
     #-- print("\t  durations: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f}, {s.Max:.3f}]".format(s=res.pFb_mVoc_duration_stats, **locals()))
     # Analyse rf results
     if True:
-        groups = {'after':[], 'during':[], 'all':[]}
+        groups = {}
+        for gkey in ['all', 'during', 'after']:
+            groups[gkey] = namedtuple('group', "ssStats, seStats, xDurStats, yDurStats, xAnnots")
+            groups[gkey].ssStats = StatsAccumulator()   # Start-Start delays
+            groups[gkey].seStats = StatsAccumulator()   # End-Start delays
+            groups[gkey].xDurStats = StatsAccumulator() # p-Feedback durations
+            groups[gkey].yDurStats = StatsAccumulator() # Vocabulary durations
+            groups[gkey].xAnnots = []  # only kept for the stats per label
         # group result between after/during
         for x, rel, y in rf:
-            groups['all'].append((x, rel, y))
             if rel[1].delay > 0:    # rel[1] correspond to pStartEnd => give use the Xstart-Yend delay
-                groups['after'].append((x, rel, y)); # feedback start strictly after the vocabulaire
+                gkey = 'after'; # feedback start strictly after the vocabulaire
             else:
-                groups['during'].append((x, rel, y)); # feedback start during the vocabulaire
+                gkey = 'during'; # feedback start during the vocabulaire
+            for group in (groups['all'], groups[gkey]):
+                group.ssStats.add(rel[0].delay)    # rel[0] is pStartStart
+                group.seStats.add(rel[1].delay)    # rel[1] is pStartEnd
+                group.xDurStats.add(annotEnd(x) - annotBegin(x))
+                group.yDurStats.add(annotEnd(y) - annotBegin(y))
+                if perLabel:
+                    group.xAnnots.append(x)
         # 'all' annotations
         for gkey in ['all', 'during', 'after']:
             group=groups[gkey]
-            if not len(group):
+            if not group.ssStats.Count:
                 continue;
-            ssDelays = [rel[0].delay for (x, rel, y) in group]    # rel[0] is pStartStart
-            ssStats = stats(ssDelays)
-            seDelays = [rel[1].delay for (x, rel, y) in group]    # rel[1] is pStartEnd
-            seStats = stats(seDelays)
-            xDurStats = stats(durations([x for (x, rel, y) in group])) # p-Feedback durations
-            yDurStats = stats(durations([y for (x, rel, y) in group])) # Vocabulary durations
+            ssStats = group.ssStats; seStats = group.seStats
+            xDurStats = group.xDurStats; yDurStats = group.yDurStats
             linked_to = "'linked' to" if gkey=='all' else gkey;
-            print("\t  {gkey}: {gsize} {pFb_tierName} {linked_to} a {mVoc_tierName}".format(gsize=len(group), **locals()))
-            print("\t    Start-Start delays: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f~},{s.Max:.3f~}]".format(s=ssStats))
+            fields = dict(count=group.ssStats.Count, feedbacks=pFb_tierName, target=mVoc_tierName
+                , start_start=ssStats, target_durations=yDurStats, feedbacks_durations=xDurStats)
             if gkey != 'during':
-                print("\t    End-Start delays: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f~},{s.Max:.3f~}]".format(s=seStats))
-            print("\t    {mVoc_tierName} durations: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f},{s.Max:.3f}]".format(s=yDurStats, **locals()))
-            print("\t    {pFb_tierName} durations: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f},{s.Max:.3f}]".format(s=xDurStats, **locals()))
+                fields['end_start'] = seStats
+            sink.record(gkey, "\t  "+gkey+": {count} {feedbacks} "+linked_to+" a {target}"
+                    +"\n\t    Start-Start delays: mean={start_start.Mean:.3f}, std.dev.={start_start.StdDev:.3f} [{start_start.Min:.3f~},{start_start.Max:.3f~}]"
+                    +("" if gkey=='during' else "\n\t    End-Start delays: mean={end_start.Mean:.3f}, std.dev.={end_start.StdDev:.3f} [{end_start.Min:.3f~},{end_start.Max:.3f~}]")
+                    +"\n\t    {target} durations: mean={target_durations.Mean:.3f}, std.dev.={target_durations.StdDev:.3f} [{target_durations.Min:.3f},{target_durations.Max:.3f}]"
+                    +"\n\t    {feedbacks} durations: mean={feedbacks_durations.Mean:.3f}, std.dev.={feedbacks_durations.StdDev:.3f} [{feedbacks_durations.Min:.3f},{feedbacks_durations.Max:.3f}]"
+                , **fields)
+            agg.stats(gkey+"/start-start delays", ssStats); agg.stats(gkey+"/end-start delays", seStats);
+            agg.stats(gkey+"/"+mVoc_tierName+" durations", yDurStats); agg.stats(gkey+"/"+pFb_tierName+" durations", xDurStats);
             if perLabel:
-                statsPerLabel([x for (x, rel, y) in group], "\t\t", normLabelWithSep);
+                statsPerLabel(group.xAnnots, "\t\t", normLabelWithSep, agg=agg, measure=gkey+"/labels");
+    return agg
 
 def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
     """
     Process relation between feedbacks and eyes direction
+    @return: the Aggregates (eyes directions and transitions counts)
     """
-    from annotationdata import Filter, RelationFilter, Rel
+    from annotationdata import Filter, Rel
     from annotationdata.filter.delay_relations import IntervalsDelay, OrPredicates
     
     #TODO? parameters
@@ -368,15 +523,15 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
     # (a) 'Vocabulaire'
     res.eyes_tier = sppas_tools.tierFind(trs, eyes_tierName)
     if res.eyes_tier is None:
-        print("\t[{eyes_tierName}] No eyes direction tier found ;-(".format(**locals()))
+        sink.message("\t[{eyes_tierName}] No eyes direction tier found ;-(", eyes_tierName=eyes_tierName)
         not_found+=1
     # (b) 'P-Feedback'
     res.fb_tier = sppas_tools.tierFind(trs, fb_tierName)
     if res.fb_tier is None:
-        print("[{fb_tierName}] No feedbacks tier found ;-(".format(**locals()))
+        sink.message("[{fb_tierName}] No feedbacks tier found ;-(", fb_tierName=fb_tierName)
         not_found+=1
     if not_found:
-        print("[%s] %d unfound tier(s) => skip this file")
+        sink.message("[%s] %d unfound tier(s) => skip this file")
         return;
 
     # Combine the 2 tiers
@@ -427,12 +582,16 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
             return 'after' # 0 < X end_start Y < max => Y starts just after X
         return; #ERROR
 
-    fEyes = Filter(res.eyes_tier); fFb=Filter(res.fb_tier);
-    rf = RelationFilter(pConv,fFb,fEyes)
+    # all the pConv relations require X and Y to overlap
+    rf = relationFilter(pConv, "inside/before/after/stable", res.fb_tier, res.eyes_tier
+        , lambda x: (annotBegin(x), annotEnd(x)))
     rConv = [(x, rel, y) for (x, rel, y) in rf]
-    print("\t[{fb_tierName}|{eyes_tierName}] {tier_len} feedbacks-eyes links (for {fb_len} feedbacks and {eyes_len} eyes)".format(tier_len=len(rConv), fb_len=len(res.fb_tier), eyes_len=len(res.eyes_tier), **locals()))
+    sink.record("links", "\t[{feedbacks}|{eyes}] {count} feedbacks-eyes links (for {feedbacks_count} feedbacks and {eyes_count} eyes)"
+        , feedbacks=fb_tierName, eyes=eyes_tierName, count=len(rConv)
+        , feedbacks_count=len(res.fb_tier), eyes_count=len(res.eyes_tier))
+    agg = Aggregates()
     if len(rConv)==0:
-        return  # any feedback linked to eyes direction
+        return agg  # any feedback linked to eyes direction
     # group relations by name
     if False:
         rels={};
@@ -444,7 +603,7 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
             print("\t  '{srel}' {lst_len} feedbacks-eyes links".format(lst_len=len(lst), **locals()))
     # group relation by 1st interval
     xrels={}
-    for (x, rel, y) in rf:
+    for (x, rel, y) in rConv:
         if x not in xrels: xrels[x] = [] # init
         xrels[x].append((x, rel, y))
     # organize the relations associated to x
@@ -478,6 +637,7 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
             xgr = 'one'
         if xgr not in groups:   groups[xgr] = [];
         groups[xgr].append(x)
+    agg.counts("changes", Counter(dict((nb, len(xAnnots)) for (nb, xAnnots) in groups.items())))
     allTransitionsCnt=Counter();
     allGrRels={'stable':[], 'before':[], 'inside':[], 'after':[]}
     for y1 in ['before', 'inside', 'after']:
@@ -489,13 +649,13 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
         # groups
         ygroups = []
         if nb=='any':   # 0 changement, only 1 interval <=> X during Y
-            print("\t  No change : {lst_len} feedbacks-eyes links ({percent:.1%})".format(**locals()))
+            sink.record("changes", "\t  No change : {count} feedbacks-eyes links ({percent:.1%})", changes=nb, count=lst_len, percent=percent)
             ygroups = ['stable']
         elif nb=='one': # 1 changement, 2 intervals => before/after (i.e. X overlapped by Y[0] and X overlaps Y[1])
-            print("\t  One change : {lst_len} feedbacks-eyes links ({percent:.1%})".format(**locals()))
+            sink.record("changes", "\t  One change : {count} feedbacks-eyes links ({percent:.1%})", changes=nb, count=lst_len, percent=percent)
             ygroups = ['before', 'after']
         else: # nb changements, nb+1 intervals => before/contains+/after  (i.e. X overlapped by Y[0] and X contains Y[1:-1] and X overlaps Y[-1])
-            print("\t  Various changes : {lst_len} feedbacks-eyes links ({percent:.1%})".format(**locals()))
+            sink.record("changes", "\t  Various changes : {count} feedbacks-eyes links ({percent:.1%})", changes=nb, count=lst_len, percent=percent)
             ygroups = ['before', 'inside', 'after']
         grRels = {}; yLabels = {}; yLabelsCnt={};
         for ygr in ygroups:
@@ -512,7 +672,8 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
                 allGrRels["(%s + stable)"%ygr] += grRels[ygr]
             yLabels[ygr] = [str(y.GetLabel().GetValue()) for (x, rel, y) in grRels[ygr] ]
             yLabelsCnt[ygr] = Counter(yLabels[ygr]);
-            print("\t   {ygr} eyes-direction: {cnt}".format(cnt=counterWithPercent(yLabelsCnt[ygr]), **locals()))
+            sink.record("eyes-direction", "\t   {direction} eyes-direction: {counts}", changes=nb, direction=ygr, counts=Percents(yLabelsCnt[ygr]))
+            agg.counts(nb+"/"+ygr+" eyes-direction", yLabelsCnt[ygr])
         # transitions
         if nb!='any':
             transitionsCnt=Counter()
@@ -520,22 +681,27 @@ def process_feedback_eyes(trs, fb_tierName='Feedback', eyes_tierName='Regard'):
                 if x in xtransitions:
                     transitionsCnt.update(xtransitions[x])
                     #for t in xtransitions[x]: transitionsCnt[t] += 1
-            print("\t   transitions: {cnt}".format(cnt=counterWithPercent(transitionsCnt, sep="\n\t                "), **locals()))
+            sink.record("transitions", "\t   transitions: {counts}", changes=nb, counts=Percents(transitionsCnt, sep="\n\t                "))
             allTransitionsCnt.update(transitionsCnt)
+            agg.counts(nb+"/transitions", transitionsCnt)
     # ALL
-    print("\t  All : {x_len} feedbacks-eyes".format(x_len=len(xrels.keys()), **locals()))
+    sink.record("all", "\t  All : {count} feedbacks-eyes", count=len(xrels))
     for ygr in ['stable', 'before', '(before + stable)', 'inside', '(inside + stable)', 'after', '(after + stable)']:
         yLabels[ygr] = [str(y.GetLabel().GetValue()) for (x, rel, y) in allGrRels[ygr] ]
         yLabelsCnt[ygr] = Counter(yLabels[ygr]);
-        print("\t   {ygr} eyes-direction: {cnt}".format(cnt=counterWithPercent(yLabelsCnt[ygr]), **locals()))
-    print("\t   transitions: {cnt}".format(cnt=counterWithPercent(transitionsCnt, sep="\n\t                "), **locals()))
+        sink.record("eyes-direction", "\t   {direction} eyes-direction: {counts}", changes="all", direction=ygr, counts=Percents(yLabelsCnt[ygr]))
+        agg.counts("all/"+ygr+" eyes-direction", yLabelsCnt[ygr])
+    sink.record("transitions", "\t   transitions: {counts}", changes="all", counts=Percents(transitionsCnt, sep="\n\t                "))
+    agg.counts("all/transitions", allTransitionsCnt)
+    return agg
 
 
 def process_feedback_per_phases(trs, fb_tierName='P-Feedback', phases_tierName='Script', most_common=False):
     """
     Process relation between feedbacks and 'phases' (Script, eye's directions, ...)
+    @return: the Aggregates (phases and feedbacks counts and durations, per phase)
     """
-    from annotationdata import Filter, SingleFilter, Sel, RelationFilter, Rel
+    from annotationdata import Filter, SingleFilter, Sel, Rel
     from annotationdata.filter.delay_relations import IntervalsDelay, OrPredicates
     
     #TODO? parameters
@@ -550,15 +716,15 @@ def process_feedback_per_phases(trs, fb_tierName='P-Feedback', phases_tierName='
     res.phases_tier = sppas_tools.tierFind(trs, phases_tierName)
     # (a) Phases
     if res.phases_tier is None:
-        print("\t[{phases_tierName}] No phases tier found ;-(".format(**locals()))
+        sink.message("\t[{phases_tierName}] No phases tier found ;-(", phases_tierName=phases_tierName)
         not_found+=1
     # (b) 'P-Feedback'
     res.fb_tier = sppas_tools.tierFind(trs, fb_tierName)
     if res.fb_tier is None:
-        print("[{fb_tierName}] No feedbacks tier found ;-(".format(**locals()))
+        sink.message("[{fb_tierName}] No feedbacks tier found ;-(", fb_tierName=fb_tierName)
         not_found+=1
     if not_found:
-        print("[%s] %d unfound tier(s) => skip this file")
+        sink.message("[%s] %d unfound tier(s) => skip this file")
         return;
     
     # Look for the various phases
@@ -573,19 +739,22 @@ def process_feedback_per_phases(trs, fb_tierName='P-Feedback', phases_tierName='
             res.perphases[phase] = namedtuple('perph', "phase, count, tier, durations, sumduration");
             res.perphases[phase].phase = phase;
     # sum of annotations/durations of phases_tier
-    ptSize = len(res.phases_tier); ptSumDurations = sum(durations(res.phases_tier));
-    print("\t[{fb_tierName}/{phases_tierName}] {nbphases} phases (#annots:{ptSize}, sum_durations={ptSumDurations:.3f}), {fbsize} feedbacks".format(nbphases=len(res.phases), fbsize=len(res.fb_tier), **locals()))
+    ptSize = len(res.phases_tier); ptSumDurations = float(durations(res.phases_tier).sum());
+    sink.record("phases", "\t[{feedbacks}/{phases}] {count} phases (#annots:{annotations}, sum_durations={sum_durations:.3f}), {feedbacks_count} feedbacks"
+        , feedbacks=fb_tierName, phases=phases_tierName, count=len(res.phases)
+        , annotations=ptSize, sum_durations=ptSumDurations, feedbacks_count=len(res.fb_tier))
+    agg = Aggregates()
+    agg.counts("phases", res.phases_counter)
     if not len(res.phases):
-        return res; # any phases
+        return agg; # any phases
 
     # sort phases by occurences
     if most_common:
         res.phases = [ phase for (phase,count) in res.phases_counter.most_common() ];
     
     # phases_tier filter
-    ptFilter = Filter(res.phases_tier)
-    # split feedback tier by phases
-    fbFilter = Filter(res.fb_tier)
+    ptFilter = tierFilter(res.phases_tier)
+    # split feedback tier by phases (the feedback/phases candidates are shared)
     phRel = OrPredicates( Rel('during') # fb during the phase
         , Rel('starts') # fb starts with the phase (and is shorter)
         , Rel('finishes') # fb ends with the phase (and is shorter)
@@ -597,65 +766,87 @@ def process_feedback_per_phases(trs, fb_tierName='P-Feedback', phases_tierName='
         perph = res.perphases[phase]
         perph.count = res.phases_counter[phase]
         phaseFilter = SingleFilter( Sel(exact=phase), ptFilter)
-        perph.tier = phaseFilter.Filter();
+        perph.tier = memoized(res.phases_tier, ('phase_tier', phase), phaseFilter.Filter);
         perph.durations = durations(perph.tier)
-        perph.sum_durations = sum(perph.durations)
-        print("\t  Phase:'{phase}' => #annot={perph.count} ({pannot:.0%}), sum_durations={perph.sum_durations} ({psdur:.0%}) (mean={s.Mean:.3f}, min={s.Min:.3f}, max={s.Max:.3f})".format(s=stats(perph.durations), pannot=float(perph.count)/ptSize, psdur=perph.sum_durations/ptSumDurations, **locals()))
-        rf = RelationFilter(phRel, fbFilter, phaseFilter)
+        perph.sum_durations = float(perph.durations.sum())
+        sink.record("phase", "\t  Phase:'{phase}' => #annot={count} ({percent:.0%}), sum_durations={sum_durations} ({sum_percent:.0%}) (mean={stats.Mean:.3f}, min={stats.Min:.3f}, max={stats.Max:.3f})"
+            , phase=phase, count=perph.count, percent=float(perph.count)/ptSize
+            , sum_durations=perph.sum_durations, sum_percent=perph.sum_durations/ptSumDurations
+            , stats=stats(perph.durations))
+        phaseMeasure = "phase[{}]/".format(phase)
+        agg.stats(phaseMeasure+"phases durations", perph.durations)
+        # all the phRel relations require the feedback and the phase to overlap
+        rf = relationFilter(phRel, "phase({!r},{!r})".format(phase, fb_phases_min_overlap), res.fb_tier, res.phases_tier
+            , lambda x: (annotBegin(x), annotEnd(x))
+            , ySelect=memoized(res.phases_tier, ('phase_annotations', phase), lambda: set(phaseFilter)))
         perph.fb_tier = rf.Filter(); perph.fb_count = len(perph.fb_tier)
         perph.fb_durations = durations(perph.fb_tier)
-        perph.fb_sum_durations = sum(perph.fb_durations)
+        perph.fb_sum_durations = float(perph.fb_durations.sum())
         perph.fb_per_sec = perph.fb_count / perph.sum_durations if perph.fb_count else 0;
         perph.sec_per_fb = perph.sum_durations / perph.fb_count if perph.fb_count else 0;
-        print("\t   #feedback={perph.fb_count}, freq={perph.fb_per_sec:.3f}/s (every {perph.sec_per_fb:.3f}s), sum_durations={perph.fb_sum_durations:.3f} ({sdurpercent:.0%})".format(sdurpercent=perph.fb_sum_durations/perph.sum_durations, **locals()))
+        fields = dict(phase=phase, count=perph.fb_count, per_sec=perph.fb_per_sec, sec_per=perph.sec_per_fb
+            , sum_durations=perph.fb_sum_durations, sum_percent=perph.fb_sum_durations/perph.sum_durations)
+        if perph.fb_count:
+            fields['stats'] = stats(perph.fb_durations)
+        sink.record("phase feedbacks", "\t   #feedback={count}, freq={per_sec:.3f}/s (every {sec_per:.3f}s), sum_durations={sum_durations:.3f} ({sum_percent:.0%})"
+                +("\n\t    durations: mean={stats.Mean:.3f}, std.dev.={stats.StdDev:.3f} [{stats.Min:.3f}, {stats.Max:.3f}]" if perph.fb_count else "")
+            , **fields)
+        agg.stats(phaseMeasure+"feedbacks durations", perph.fb_durations)
         if perph.fb_count:
-            print("\t    durations: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f}, {s.Max:.3f}]".format(s=stats(perph.fb_durations), **locals()))
             statsPerLabel(perph.fb_tier, "\t\t", normLabelWithSep
                 #TODO(pb repeated phases)# , intraDelays 
-                );
-    return res;
+                , agg=agg, measure=phaseMeasure+"labels");
+    return agg;
 
 
 ## sub-process tools
 
-def statsPerLabel(tier, prefix="", normalize=None, moreStats=None):
+def statsPerLabel(tier, prefix="", normalize=None, moreStats=None, agg=None, measure="labels"):
+    """
+    Output (see sink) the count and durations of each label (and moreStats(annotations, prefix, agg, measure))
+    @param agg: (optional) the Aggregates to update, with the labels counts (as measure) and,
+        for each label, the "measure[label]/durations" values
+    """
     res = namedtuple('res', "labels, labels_count, labels_annotations, labels_durations, labels_sumdurations"
               #+", fb_tier, fb_durations, fb_duration_stats, fb_radius"
           ) # list of fields
-    res.labels = []; res.labels_count = Counter();
-    res.labels_annotations = dict();
-    count=0;
     # group by labels
-    for ann in tier:
-        count += 1;
-        label = ann.GetLabel().GetValue()
-        if normalize:
-            label = normalize(label)
-        res.labels_count[label] += 1
-        if res.labels_count[label] == 1:
-            res.labels.append(label)
-            res.labels_annotations[label] = [] #init
-        res.labels_annotations[label].append(ann)
+    cols = tierColumns(tier, normalize)
+    count = len(cols)
+    res.labels = cols.labels
+    counts = np.bincount(cols.label_ids, minlength=len(cols.labels))
+    res.labels_count = Counter();
+    for (label, nb) in zip(res.labels, counts): # same insertion order than a count per annotation
+        res.labels_count[label] = int(nb)
     # durations
+    durs = cols.durations()
+    sumdurations = np.bincount(cols.label_ids, weights=durs, minlength=len(cols.labels))
     res.labels_durations = dict(); res.labels_sumdurations = dict();
-    sum_durations=0; 
-    for label in res.labels:
-        res.labels_durations[label] = durations(res.labels_annotations[label])
-        res.labels_sumdurations[label] = sum(res.labels_durations[label])
-        sum_durations += res.labels_sumdurations[label]
+    for (lid, label) in enumerate(res.labels):
+        res.labels_durations[label] = durs[cols.label_ids == lid]
+        res.labels_sumdurations[label] = float(sumdurations[lid])
+    sum_durations = float(sumdurations.sum())
+    if agg is not None:
+        agg.counts(measure, res.labels_count)
     # sort by more frequent (in number)
     for label, nb in res.labels_count.most_common():
-        nbpercent= float(nb) / count;
         sdur=res.labels_sumdurations[label];
-        sdurpercent = sdur / sum_durations;
-        print(prefix+"label:'{label}' nb={nb} ({nbpercent:.0%}), sum_durations={sdur:.3f} ({sdurpercent:.0%})".format(**locals()))
-        print(prefix+"  durations: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f}, {s.Max:.3f}]".format(s=stats(res.labels_durations[label]), **locals()))
+        sink.record(measure, prefix+"label:'{label}' nb={count} ({percent:.0%}), sum_durations={sum_durations:.3f} ({sum_percent:.0%})"
+                +"\n"+prefix+"  durations: mean={stats.Mean:.3f}, std.dev.={stats.StdDev:.3f} [{stats.Min:.3f}, {stats.Max:.3f}]"
+            , label=label, count=nb, percent=float(nb) / count
+            , sum_durations=sdur, sum_percent=sdur / sum_durations
+            , stats=stats(res.labels_durations[label]))
+        labelMeasure = "{}[{}]/".format(measure, label)
+        if agg is not None:
+            agg.stats(labelMeasure+"durations", res.labels_durations[label])
         if moreStats:
-            moreStats(res.labels_annotations[label], prefix=prefix+"  ");
+            moreStats(cols.annotationsWithLabel(label), prefix=prefix+"  ", agg=agg, measure=labelMeasure);
     
-def intraDelays(res, prefix=""):
+def intraDelays(res, prefix="", agg=None, measure=""):
     """
     Compute the End-Start and Mid-Mid delays stats
+    @param agg: (optional) the Aggregates to update, with the "<measure>end-start delays"
+        and "<measure>middle-middle delays" values
     """
     from annotationdata.filter.delay_relations import IntervalsDelay
     # check res.tier or res is the tier
@@ -680,8 +871,13 @@ def intraDelays(res, prefix=""):
         res.middle_middle_delays_stats = stats(res.middle_middle_delays)
         firstStart = res.tier[0].GetLocation().GetBeginMidpoint()
         firstMiddle = (res.tier[0].GetLocation().GetBeginMidpoint() + res.tier[0].GetLocation().GetEndMidpoint()) / 2;
-        print(prefix+"first start at {firstStart}, inter end-start delays: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f~}, {s.Max:.3f~}]".format(s=res.end_start_delays_stats, **locals()))
-        print(prefix+"first middle point at {firstMiddle}, inter middle-middle delays: mean={s.Mean:.3f}, std.dev.={s.StdDev:.3f} [{s.Min:.3f~}, {s.Max:.3f~}]".format(s=res.middle_middle_delays_stats, **locals()))
+        sink.record(measure+"end-start delays", prefix+"first start at {first}, inter end-start delays: mean={stats.Mean:.3f}, std.dev.={stats.StdDev:.3f} [{stats.Min:.3f~}, {stats.Max:.3f~}]"
+            , first=firstStart, stats=res.end_start_delays_stats)
+        sink.record(measure+"middle-middle delays", prefix+"first middle point at {first}, inter middle-middle delays: mean={stats.Mean:.3f}, std.dev.={stats.StdDev:.3f} [{stats.Min:.3f~}, {stats.Max:.3f~}]"
+            , first=firstMiddle, stats=res.middle_middle_delays_stats)
+        if agg is not None:
+            agg.stats(measure+"end-start delays", res.end_start_delays_stats)
+            agg.stats(measure+"middle-middle delays", res.middle_middle_delays_stats)
     return res;
 
 def normLabelWithSep(label, split="\s*\+\s*", sep=" + ", sort=True):
@@ -702,15 +898,272 @@ def radius(tier):
     """
     Get the (maximum) radius of tier's annotation points
     """
-    radiusList = [ann.GetLocation().GetBeginRadius() for ann in tier] # all begin points radius
-    radiusList += [ann.GetLocation().GetEndRadius() for ann in tier] # add end point radius
-    return max(radiusList) # max of all begin/end points radius
+    return float(tierColumns(tier).radius.max()) # max of all begin/end points radius
 
 def durations(tier):
     """
-    Get the list of duration of tier's annotations
+    Get the array of duration of tier's annotations
+    """
+    return tierColumns(tier).durations()
+
+class TierColumns(object):
+    """
+    Columnar snapshot of a tier (or a list of annotations):
+    begin/end/radius float64 arrays and an array of interned label ids
+    """
+    def __init__(self, annotations, normalize=None):
+        self.annotations = list(annotations)
+        self.ids = tuple(map(id, self.annotations)) # (see tierColumns)
+        self.normalize = normalize
+        n = len(self.annotations)
+        self.begins = np.empty(n); self.ends = np.empty(n); self.radius = np.empty(n);
+        self.label_ids = np.empty(n, dtype=np.intp)
+        self.labels = [] # the labels, in order of first occurrence
+        ids = {}
+        for (i, ann) in enumerate(self.annotations):
+            loc = ann.GetLocation()
+            self.begins[i] = loc.GetBeginMidpoint()
+            self.ends[i] = loc.GetEndMidpoint()
+            self.radius[i] = max(loc.GetBeginRadius(), loc.GetEndRadius())
+            label = ann.GetLabel().GetValue()
+            if normalize:
+                label = normalize(label)
+            lid = ids.get(label)
+            if lid is None:
+                lid = ids[label] = len(self.labels)
+                self.labels.append(label)
+            self.label_ids[i] = lid
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def durations(self):
+        return self.ends - self.begins
+
+    def annotationsWithLabel(self, label):
+        lid = self.labels.index(label)
+        return [self.annotations[i] for i in np.flatnonzero(self.label_ids == lid)]
+
+def tierColumns(tier, normalize=None):
+    """
+    Get the TierColumns of a tier, built once per tier (and normalize function)
+    and rebuilt if the tier annotations changed (added, removed or replaced);
+    the annotations modified in place aren't seen, so the cache is dropped at
+    the start of each run_plan (see dropMemos)
+    @param tier: a tier or a list of annotations (not kept)
     """
-    return [ann.GetLocation().GetDuration().GetValue() for ann in tier]
+    if isinstance(tier, TierColumns) and tier.normalize is normalize:
+        return tier
+    if isinstance(tier, list):
+        return TierColumns(tier, normalize)
+    cols = getattr(tier, '_tier_columns', None)
+    if cols is None or cols.normalize is not normalize or cols.ids != tuple(map(id, tier)):
+        cols = TierColumns(tier, normalize)
+        try:
+            tier._tier_columns = cols
+        except AttributeError:
+            pass
+    return cols
+
+class TierIndex(object):
+    """
+    Sorted-endpoint index over the annotations of a tier (or a filter)
+    The annotations are sorted by begin, with a (binary) tree of the maximum end of
+    each range of them: built once, in O(n.log(n)), it gives in O((k+1).log(n)) the k
+    annotations overlapping a time window, whatever their durations (b.e. a long
+    interval doesn't make each query scan the annotations it covers)
+    """
+    def __init__(self, annotations):
+        annotations = list(annotations)
+        order = sorted(xrange(len(annotations)), key=lambda i: annotBegin(annotations[i]))
+        self.positions = order # original position of the sorted annotations
+        self.annotations = [annotations[i] for i in order]
+        self.begins = [annotBegin(ann) for ann in self.annotations]
+        self.ends = [annotEnd(ann) for ann in self.annotations]
+        # maxEnds[node]: the maximum end of the node's annotations, the leaves being
+        # maxEnds[size:size+n], and the children of a node 2*node and 2*node+1
+        self.size = 1
+        while self.size < len(self.ends):
+            self.size *= 2
+        self.maxEnds = [float('-inf')] * (2 * self.size)
+        self.maxEnds[self.size:self.size + len(self.ends)] = self.ends
+        for node in xrange(self.size - 1, 0, -1):
+            self.maxEnds[node] = max(self.maxEnds[2 * node], self.maxEnds[2 * node + 1])
+        self.maxRadius = max([annotRadius(ann) for ann in annotations]) if annotations else 0.
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def __iter__(self):
+        """ Iterate the annotations in their original order """
+        for i in sorted(xrange(len(self.annotations)), key=self.positions.__getitem__):
+            yield self.annotations[i]
+
+    def overlapping(self, start, end, margin=0.):
+        """
+        Get the annotations that may overlap [start-margin, end+margin]
+        @return: the list of annotations (in their original order)
+        """
+        start -= margin; end += margin
+        hi = bisect_right(self.begins, end) # the annotations [0, hi) begin before the window end
+        found = []
+        stack = [(1, 0, self.size)] if hi else [] # (node, first, last+1 annotation)
+        while stack:
+            (node, first, last) = stack.pop()
+            if first >= hi or self.maxEnds[node] < start:   # any annotation of the node overlaps
+                continue
+            if node >= self.size:   # leaf
+                found.append(first)
+                continue
+            middle = (first + last) // 2
+            stack.append((2 * node + 1, middle, last))
+            stack.append((2 * node, first, middle))
+        found.sort(key=self.positions.__getitem__)
+        return [self.annotations[i] for i in found]
+
+class RelationResults(object):
+    """
+    The (x, rel, y) results of a relation, shared by the filters of this relation
+      - done : the results are computed (b.e. an empty list, for any relation found)
+      - results : the list of (x, rel, y)
+    """
+    def __init__(self):
+        self.done = False
+        self.results = []
+
+_IndexedRelationFilter = None
+def IndexedRelationFilter(relation, xfilter, yfilter, candidates, results=None):
+    """
+    Create a RelationFilter that only tests, for each X annotation, the Y candidates(x)
+    The relation must not be true for the other Y, then the (x, rel, y) results
+    (and the Filter() tier) are the same than RelationFilter(relation, xfilter, yfilter)
+    @param relation: the predicate
+    @param xfilter: the X filter
+    @param yfilter: the Y filter (the candidates are a subset of its annotations)
+    @param candidates: a function x => the list of Y annotations to test (in the Y order)
+    @param results: (optional) the RelationResults, filled by the first complete
+        iteration then reused by the next ones
+    """
+    global _IndexedRelationFilter
+    if _IndexedRelationFilter is None:
+        from annotationdata import RelationFilter
+        class _IndexedRelationFilter(RelationFilter):
+            def __init__(self, relation, xfilter, yfilter, candidates, results=None):
+                RelationFilter.__init__(self, relation, xfilter, yfilter)
+                self.relation = relation; self.xfilter = xfilter
+                self.candidates = candidates
+                self.results = results if results is not None else RelationResults()
+            def __iter__(self):
+                if self.results.done:
+                    for (x, rel, y) in self.results.results:
+                        yield x, rel, y
+                    return
+                results = []
+                for x in self.xfilter:
+                    for y in self.candidates(x):
+                        rel = self.relation(x, y)
+                        if rel:
+                            results.append((x, rel, y))
+                            yield x, rel, y
+                self.results.results = results; self.results.done = True
+    return _IndexedRelationFilter(relation, xfilter, yfilter, candidates, results)
+
+def relationFilter(relation, signature, xTier, yTier, window, lookback=0., ySelect=None):
+    """
+    Get the IndexedRelationFilter of a relation between 2 tiers
+    The (X, Y) candidate pairs (see candidatePairs) and the relation results
+    (keyed by the signature) are shared between all the analyses of these tiers.
+    @param relation: the predicate
+    @param signature: a string identifying the predicate (and ySelect)
+    @param window: a function x => (start, end), the time window Y must overlap
+        for the relation, with start >= Xstart - lookback and end <= Xend
+    @param lookback: (maximum) time between the window start and the X start
+    @param ySelect: (optional) the (set of) Y annotations to keep
+    """
+    pairs = candidatePairs(xTier, yTier, lookback)
+    margin = 2 * pairs.maxRadius  # time points comparison precision
+    def candidates(x):
+        (start, end) = window(x)
+        return [y for y in pairs.candidates[x]
+            if annotBegin(y) <= end + margin and annotEnd(y) >= start - margin
+                and (ySelect is None or y in ySelect)]
+    results = memoized(xTier, ('relation', id(yTier), signature), RelationResults)
+    return IndexedRelationFilter(relation, tierFilter(xTier), tierFilter(yTier), candidates, results)
+
+def candidatePairs(xTier, yTier, lookback=0.):
+    """
+    Get the (X, Y) candidate pairs of 2 tiers, i.e. for each X the Y overlapping
+    [Xstart - lookback, Xend] (with a radius margin), computed once per tiers pair
+    (and recomputed only if a longer lookback is required)
+    """
+    pairs = memoized(xTier, ('pairs', id(yTier)), lambda: None)
+    if pairs is None or pairs.lookback < lookback:
+        pairs = memoized(xTier, ('pairs', id(yTier)), lambda: CandidatePairs(xTier, tierIndex(yTier), lookback), force=True)
+    return pairs
+
+class CandidatePairs(object):
+    """
+    For each X annotation, the Y annotations overlapping [Xstart - lookback, Xend]
+    (with a radius margin), in the Y order
+      - lookback : the lookback used
+      - maxRadius : the maximum radius of the X and Y annotations
+      - candidates : a dict x => list of Y
+    """
+    def __init__(self, xannotations, yindex, lookback=0.):
+        self.lookback = lookback
+        self.maxRadius = max([annotRadius(x) for x in xannotations] + [yindex.maxRadius])
+        margin = 2 * self.maxRadius
+        self.candidates = {}
+        for x in xannotations:
+            self.candidates[x] = yindex.overlapping(annotBegin(x) - lookback, annotEnd(x), margin)
+
+def annotBegin(annot):
+    return annot.GetLocation().GetBeginMidpoint()
+
+def annotEnd(annot):
+    return annot.GetLocation().GetEndMidpoint()
+
+def annotRadius(annot):
+    return max(annot.GetLocation().GetBeginRadius(), annot.GetLocation().GetEndRadius())
+
+def memoized(obj, key, build, force=False):
+    """
+    Get the value attached to an object (Transcription, Tier) for a key,
+    computed once with build()
+    @param force: build (and attach) the value, even if one is yet attached
+    """
+    memo = getattr(obj, '_stats2_memo', None)
+    if memo is None:
+        memo = {}
+        try:
+            obj._stats2_memo = memo
+        except AttributeError:  # can't attach => no memo
+            return build()
+    if force or key not in memo:
+        memo[key] = build()
+    return memo[key]
+
+def dropMemos(trs):
+    """
+    Drop the values attached to a transcription and its tiers (see memoized, tierColumns)
+    """
+    for obj in [trs] + list(trs):
+        for name in ('_stats2_memo', '_tier_columns'):
+            if hasattr(obj, name):
+                delattr(obj, name)
+
+def tierFilter(tier):
+    """
+    Get the Filter of a tier (built once per tier)
+    """
+    from annotationdata import Filter
+    return memoized(tier, 'filter', lambda: Filter(tier))
+
+def tierIndex(tier):
+    """
+    Get the TierIndex of a tier (built once per tier)
+    """
+    return memoized(tier, 'index', lambda: TierIndex(tier))
 
 def getTier(trs, tierName=None, errorMsg=None):
     """
@@ -738,16 +1191,81 @@ def getTier(trs, tierName=None, errorMsg=None):
 def stats(lst):
     """
     Compute various statistics
+    @param lst: an iterable of values (or a numpy array)
     @rtype: something with attributes:
         - Max/Min : the maximum value
         - Mean : the mean value
+        - StdDev : the standard deviation
+    """
+    if isinstance(lst, np.ndarray):   # vectorized
+        stats = namedtuple('Stats', "Min,Max,Mean,StdDev") # list of fields
+        stats.Min = float(lst.min()) if len(lst) else 0.;
+        stats.Max = float(lst.max()) if len(lst) else 0.;
+        stats.Mean = float(lst.mean()) if len(lst) else 0.;
+        stats.StdDev = float(lst.std()) if len(lst) else 0.;
+        return stats
+    return StatsAccumulator(lst)
+
+class StatsAccumulator(object):
     """
-    stats = namedtuple('Stats', "Min,Max,Mean,StdDev") # list of fields
-    stats.Min = min(lst) if len(lst) else 0.;
-    stats.Max = max(lst) if len(lst) else 0.;
-    stats.Mean = mean(lst) if len(lst) else 0.;
-    stats.StdDev = stddev(lst, stats.Mean) if len(lst) else 0.;
-    return stats
+    Single-pass (Welford) statistics of a stream of values (floats or Delay/Duration)
+    Min/Max are the original values (b.e. Delay keep their margin), Mean/StdDev are floats
+    """
+    def __init__(self, values=None):
+        self.Count = 0
+        self._minv = self._maxv = None # original min/max values
+        self._min = self._max = None
+        self._sum = 0.; self._sumsq = 0.; self._mean = 0.; self._m2 = 0.
+        if values is not None:
+            self.update(values)
+
+    def add(self, v):
+        """ Add a value """
+        value = v if isinstance(v, float) else delayValue(v)
+        self.Count += 1
+        if self.Count == 1 or value < self._min:
+            self._minv = v; self._min = value
+        if self.Count == 1 or value > self._max:
+            self._maxv = v; self._max = value
+        self._sum += value; self._sumsq += value * value
+        delta = value - self._mean
+        self._mean += delta / self.Count
+        self._m2 += delta * (value - self._mean)
+
+    def update(self, values):
+        """ Add all the values of an iterable """
+        for v in values:
+            self.add(v)
+
+    @property
+    def Min(self):
+        return self._minv if self.Count else 0.
+
+    @property
+    def Max(self):
+        return self._maxv if self.Count else 0.
+
+    @property
+    def Mean(self):
+        return self._sum / self.Count if self.Count else 0.
+
+    @property
+    def StdDev(self):
+        return (self._m2 / self.Count) ** 0.5 if self.Count else 0.
+
+_Delay = None
+def delayValue(v):
+    """
+    Get the float value of v (a number, Delay, Duration, ...)
+    """
+    global _Delay
+    if isinstance(v, (int, long, float)):
+        return float(v)
+    if _Delay is None:
+        from annotationdata.filter.delay_relations import Delay
+        _Delay = Delay
+    value, margin = _Delay.unpack(v) # safer way to get the value part, as float(Duration) didn't work
+    return float(value)
 
 def mean(lst):
     """
@@ -755,12 +1273,7 @@ def mean(lst):
     @param lst: the list of values
     @rtype: float
     """
-    from annotationdata.filter.delay_relations import Delay
-    sum_=0.; n=0;
-    for v in lst:
-        value, margin = Delay.unpack(v) # safer way to get the value part, as float(Duration) didn't work
-        sum_ += float(value); n+=1
-    return sum_/n if n else 0;
+    return StatsAccumulator(lst).Mean
 
 def stddev(lst, mean=None):
     """
@@ -770,14 +1283,317 @@ def stddev(lst, mean=None):
     @rtype: float
     """
     if mean is None:
-        mean = mean(lst)
-    from annotationdata.filter.delay_relations import Delay
+        return StatsAccumulator(lst).StdDev
     sum_=0.; n=0;
     for v in lst:
-        value, margin = Delay.unpack(v) # safer way to get the value part, as float(Duration) didn't work
-        sum_ += (float(value)-mean) ** 2; n+=1
+        sum_ += (delayValue(v)-mean) ** 2; n+=1
     return (sum_/n) ** 0.5 if n else 0;
 
+# ----------------------------------------------------------------------------
+# --- Aggregated (mergeable) results
+# ----------------------------------------------------------------------------
+
+class Aggregate(object):
+    """
+    Mergeable statistics of a set of values: Count, Sum, SumSquares, Min and Max
+    (Mean and StdDev are computed from them)
+    """
+    def __init__(self, count=0, sum=0., sumSquares=0., min=None, max=None):
+        self.Count = count
+        self.Sum = sum; self.SumSquares = sumSquares
+        self.Min = min; self.Max = max
+
+    @classmethod
+    def of(cls, values):
+        """
+        The Aggregate of values
+        @param values: a StatsAccumulator, a numpy array or an iterable of values (floats or Delay/Duration)
+        """
+        if isinstance(values, StatsAccumulator):
+            if not values.Count:
+                return cls()
+            return cls(values.Count, values._sum, values._sumsq, values._min, values._max)
+        if not isinstance(values, np.ndarray):
+            values = np.array([delayValue(v) for v in values], dtype=float)
+        if not len(values):
+            return cls()
+        return cls(len(values), float(values.sum()), float(np.dot(values, values)), float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        """ Add the values of an other Aggregate """
+        if other.Count:
+            self.Min = other.Min if not self.Count else min(self.Min, other.Min)
+            self.Max = other.Max if not self.Count else max(self.Max, other.Max)
+            self.Count += other.Count
+            self.Sum += other.Sum; self.SumSquares += other.SumSquares
+        return self
+
+    @property
+    def Mean(self):
+        return self.Sum / self.Count if self.Count else 0.
+
+    @property
+    def StdDev(self):
+        return max(self.SumSquares / self.Count - self.Mean ** 2, 0.) ** 0.5 if self.Count else 0.
+
+    FIELDS = ('count', 'sum', 'sum_squares', 'min', 'max', 'mean', 'std_dev')
+    def values(self):
+        """ The values of the FIELDS """
+        return (self.Count, self.Sum, self.SumSquares, self.Min, self.Max, self.Mean, self.StdDev)
+
+class Aggregates(object):
+    """
+    The mergeable results of analyses, i.e. for each (analysis, measure), an Aggregate
+    of the measured values or a Counter (b.e. of the labels)
+    The results of various analyses, files or processes are combined with merge().
+    """
+    def __init__(self):
+        self.entries = OrderedDict() # (analysis, measure) => Aggregate or Counter
+
+    def stats(self, measure, values, analysis=""):
+        """ Add values (see Aggregate.of) to a measure """
+        self.add((analysis, measure), Aggregate.of(values))
+
+    def counts(self, measure, counter, analysis=""):
+        """ Add the counts of a Counter to a measure """
+        self.add((analysis, measure), Counter(counter))
+
+    def add(self, key, value):
+        if key not in self.entries:
+            self.entries[key] = value
+        elif isinstance(value, Counter):
+            self.entries[key].update(value)
+        else:
+            self.entries[key].merge(value)
+
+    def merge(self, other, analysis=None):
+        """
+        Add the results of an other Aggregates
+        @param analysis: (optional) the analysis name of the other results
+        """
+        for ((oanalysis, measure), value) in other.entries.items():
+            value = Counter(value) if isinstance(value, Counter) else Aggregate().merge(value) # copy
+            self.add((analysis if analysis is not None else oanalysis, measure), value)
+        return self
+
+    def toJSON(self):
+        """ @return the list of the entries, as JSON objects """
+        entries = []
+        for ((analysis, measure), value) in self.entries.items():
+            entry = OrderedDict([('analysis', analysis), ('measure', measure)])
+            if isinstance(value, Counter):
+                entry['counts'] = OrderedDict(value.most_common())
+            else:
+                entry.update(zip(Aggregate.FIELDS, value.values()))
+            entries.append(entry)
+        return entries
+
+    @classmethod
+    def fromJSON(cls, entries):
+        """ The Aggregates of a list of JSON objects (see toJSON) """
+        res = cls()
+        for entry in entries:
+            key = (entry['analysis'], entry['measure'])
+            if 'counts' in entry:
+                res.add(key, Counter(entry['counts']))
+            else:
+                res.add(key, Aggregate(entry['count'], entry['sum'], entry['sum_squares'], entry['min'], entry['max']))
+        return res
+
+    CSV_HEADER = ('analysis', 'measure', 'label') + Aggregate.FIELDS
+    def csvRows(self):
+        """ The CSV rows (see CSV_HEADER): one per Aggregate and one per Counter's label """
+        for ((analysis, measure), value) in self.entries.items():
+            if isinstance(value, Counter):
+                for (label, count) in value.most_common():
+                    yield (analysis, measure, label, count) + ('',) * (len(Aggregate.FIELDS) - 1)
+            else:
+                yield (analysis, measure, '') + tuple('' if v is None else v for v in value.values())
+
+class Summary(object):
+    """
+    The results (Aggregates) of each file (by absolute path), and their total
+    Saved in a JSON file (see load), or a CSV file (one row per file and result, with
+    the '(all files)' total rows at the end)
+    """
+    TOTAL = "(all files)"
+
+    def __init__(self):
+        self.files = OrderedDict()  # file => Aggregates
+
+    def add(self, f, aggregates):
+        """ Set the results of a file, keyed by its absolute path
+            (as a processFiles callback, the results aren't kept)
+        """
+        if aggregates is not None:
+            self.set(os.path.abspath(f), aggregates)
+
+    def update(self, other):
+        """ Set the results of the files of an other Summary """
+        for (f, aggregates) in other.files.items():
+            self.set(f, aggregates)
+
+    def set(self, f, aggregates):
+        """ Set the results of a file, with a warning if other results are replaced """
+        if f in self.files and self.files[f].toJSON() != aggregates.toJSON():
+            print("(!) [%s] replace the (different) results of this file in the summary" % f, file=sys.stderr)
+        self.files[f] = aggregates
+
+    def total(self):
+        """ @return the Aggregates of all the files """
+        total = Aggregates()
+        for aggregates in self.files.values():
+            total.merge(aggregates)
+        return total
+
+    def save(self, filename):
+        """ Save into a JSON or CSV (.csv extension) file """
+        if re.search(r"\.csv$", filename, re.I):
+            import csv
+            with open(filename, 'wb') as out:
+                writer = csv.writer(out)
+                writer.writerow(('file',) + Aggregates.CSV_HEADER)
+                for (f, aggregates) in self.files.items() + [(self.TOTAL, self.total())]:
+                    for row in aggregates.csvRows():
+                        writer.writerow((f,) + row)
+        else:
+            import json
+            with open(filename, 'w') as out:
+                json.dump(OrderedDict([('files', OrderedDict((f, aggregates.toJSON()) for (f, aggregates) in self.files.items()))
+                    , ('total', self.total().toJSON())]), out, indent=1)
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a JSON summary """
+        import json
+        with open(filename) as fd:
+            content = json.load(fd, object_pairs_hook=OrderedDict)
+        res = cls()
+        for (f, entries) in content['files'].items():
+            res.files[f] = Aggregates.fromJSON(entries)
+        return res
+
+# ----------------------------------------------------------------------------
+# --- Results output (sinks)
+# ----------------------------------------------------------------------------
+
+class TextSink(object):
+    """
+    Print the results as text (the default output)
+    Each result is a record: a name, a text template (str.format) and the fields,
+    the template is only formatted by this sink.
+    """
+    def __init__(self):
+        self.file = None # the current file
+        self.analysis = None # the current analysis (see analysisName)
+
+    def start(self):
+        """ Called (once, in the main process) before the files processing """
+        pass
+
+    def startFile(self, f):
+        """ Set the file of the next records """
+        self.file = f; self.analysis = None
+
+    def startAnalysis(self, analysis):
+        """ Set the analysis of the next records """
+        self.analysis = analysis
+
+    def message(self, template, **fields):
+        """ A progress/warning message (not a result), the template can use the {file} """
+        print(template.format(file=self.file, **fields))
+
+    def record(self, name, template, **fields):
+        """ A result: the name of the record, its text template (that can use the {file}) and its fields """
+        print(template.format(file=self.file, **fields))
+
+class JSONLinesSink(TextSink):
+    """
+    Print one JSON object per record: {"file", "analysis", "record": name, <fields>}
+    (the stats as {count, mean, std_dev, min, max} and the counters as {label: count})
+    The messages are printed on stderr.
+    """
+    def message(self, template, **fields):
+        print(template.format(file=self.file, **fields), file=sys.stderr)
+
+    def record(self, name, template, **fields):
+        import json
+        entry = OrderedDict([('file', self.file), ('analysis', self.analysis), ('record', name)])
+        entry.update((field, jsonValue(value)) for (field, value) in sorted(fields.items()))
+        print(json.dumps(entry))
+
+class CSVSink(JSONLinesSink):
+    """
+    Print one CSV row per record field: file, analysis, index (of the record in the file), record, field, value
+    (the stats and counters fields are flatten, b.e. "s.mean" or "counts.<label>")
+    """
+    HEADER = ('file', 'analysis', 'index', 'record', 'field', 'value')
+
+    def start(self):
+        import csv
+        csv.writer(sys.stdout).writerow(self.HEADER)
+
+    def startFile(self, f):
+        TextSink.startFile(self, f); self.index = 0
+
+    def record(self, name, template, **fields):
+        import csv
+        writer = csv.writer(sys.stdout) # sys.stdout may be a (worker) buffer
+        for (field, value) in sorted(fields.items()):
+            for (key, v) in flatValues(field, jsonValue(value)):
+                writer.writerow((self.file, self.analysis or '', self.index, name, key, '' if v is None else v))
+        self.index += 1
+
+# the sinks, by output format
+SINKS = {
+    'text': TextSink,
+    'jsonl': JSONLinesSink,
+    'csv': CSVSink,
+    }
+sink = TextSink() # the results sink (see main)
+
+class Percents(object):
+    """
+    A Counter field, formatted (only in text) with the percent of each key (see counterWithPercent)
+    """
+    def __init__(self, counter, sep=', '):
+        self.counter = counter; self.sep = sep
+
+    def __format__(self, spec):
+        return counterWithPercent(self.counter, sep=self.sep)
+
+def jsonValue(value):
+    """
+    The JSON value of a record field: the numbers and strings, the Counter (or Percents)
+    as {key: count}, the statistics as {count, mean, std_dev, min, max} and the Delay/Duration as float
+    """
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Percents):
+        value = value.counter
+    if isinstance(value, Counter):
+        return OrderedDict(value.most_common())
+    if hasattr(value, 'Mean') and hasattr(value, 'StdDev'): # stats(), StatsAccumulator or Aggregate
+        res = OrderedDict()
+        if hasattr(value, 'Count'):
+            res['count'] = value.Count
+        res['mean'] = value.Mean; res['std_dev'] = value.StdDev
+        res['min'] = delayValue(value.Min) if value.Min is not None else None
+        res['max'] = delayValue(value.Max) if value.Max is not None else None
+        return res
+    return delayValue(value)
+
+def flatValues(field, value):
+    """ The (field, value) of a JSON value, the objects being flatten as "field.key" """
+    if isinstance(value, dict):
+        for (key, v) in value.items():
+            for item in flatValues("{}.{}".format(field, key), v):
+                yield item
+    else:
+        yield (field, value)
+
 # ----------------------------------------------------------------------------
 # --- Main stuffs
 # ----------------------------------------------------------------------------
@@ -787,11 +1603,18 @@ def main():
     """ This is the main function to do something. """
     parser.parse_args(namespace=opts)
     #print(opts)
-    if len(opts.files)==0:
+    if len(opts.files)==0 and not (opts.summary_file and opts.add_summaries):
         print("ERROR: at least one file to process is required", file=sys.stderr)
         parser.print_help()
         exit(1)
-    sppas_tools.load_sppas(opts);
+    try:
+        opts.plan = load_plan(opts.plan_file) if opts.plan_file else default_plan
+    except (IOError, ValueError) as e:
+        print("ERROR: invalid plan '%s': %s" % (opts.plan_file, e), file=sys.stderr)
+        exit(1)
+    global sink
+    sink = SINKS[opts.output_format]()
+    sppas_tools.load_sppas(opts, verbose=(opts.output_format=='text'));
     process_files(opts.files, opts)
 
 # ----------------------------------------------------------------------------
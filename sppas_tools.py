@@ -17,58 +17,342 @@ import sys, os
 # ----------------------------------------------------------------------------
 
 # ----------------------------------------------------------------------------
-def load_sppas(opts):
-    """ Method to load SPPAS API
-        Use global sppas_dir/sppas_version to find the SPPAS directory
-        Then import annotationdata
+_sppasPath = None   # the (resolved) SPPAS 'sppas/src' path, see sppasPath()
+def sppasPath(opts, log=(lambda *args: None)):
+    """ Find the SPPAS directory (once, the result is kept by the process)
+        Use sppas_dir/sppas_version options, then SPPAS_DIR/SPPAS_VERSION
+        environment variables, then ${HOME}/bin/sppas-${sppas-version}
+        The directory found for a version is kept in a cache file (see
+        sppasDirCacheFile), so the next invocations only check it still exists.
+        @return the path of the SPPAS sources ('sppas/src')
     """
+    global _sppasPath
+    if _sppasPath is not None:
+        return _sppasPath
     # (a) SPPAS_DIR
     if opts.sppas_dir:
-        print("Use argument SPPAS directory:%s" % opts.sppas_dir)
+        log("Use argument SPPAS directory:%s" % opts.sppas_dir)
     elif os.environ.get('SPPAS_DIR'):
         opts.sppas_dir=os.environ['SPPAS_DIR']
-        print("Use environment variable SPPAS_DIR as SPPAS directory:%s" % opts.sppas_dir)
+        log("Use environment variable SPPAS_DIR as SPPAS directory:%s" % opts.sppas_dir)
     else:
         # (a.1) SPPAS_VERSION
         if opts.sppas_version:
-            print("Use argument SPPAS version:%s" % opts.sppas_version)
+            log("Use argument SPPAS version:%s" % opts.sppas_version)
         elif os.environ.get('SPPAS_VERSION'):
             opts.sppas_version=os.environ['SPPAS_VERSION']
-            print("Use environment variable SPPAS_VERSION:%s" % opts.sppas_version)
+            log("Use environment variable SPPAS_VERSION:%s" % opts.sppas_version)
         else:
             opts.sppas_version='1.7.7'
-            print("Use default SPPAS_VERSION:%s" % opts.sppas_version)
-        #TODO: try 
-        opts.sppas_dir=os.path.join(os.environ['HOME'], 'bin', 'sppas-%s' % opts.sppas_version)
-        if os.path.isdir(opts.sppas_dir):
-            print("Use SPPAS directory:%s" % opts.sppas_dir)
+            log("Use default SPPAS_VERSION:%s" % opts.sppas_version)
+        # (a.2) the cached directory of this version (and home)
+        key = (os.environ.get('HOME', ''), opts.sppas_version)
+        cached = readSPPASDirCache().get(key)
+        if cached and os.path.isdir(cached):
+            opts.sppas_dir = cached
+            log("Use (cached) SPPAS directory:%s" % opts.sppas_dir)
         else:
-            sys.exit("Any SPPAS directory !")
-    
-    sppas_path = os.path.abspath(os.path.join(opts.sppas_dir, 'sppas', 'src'))
-    sys.path.insert(0,sppas_path)
+            #TODO: try 
+            opts.sppas_dir=os.path.join(os.environ['HOME'], 'bin', 'sppas-%s' % opts.sppas_version)
+            if os.path.isdir(opts.sppas_dir):
+                log("Use SPPAS directory:%s" % opts.sppas_dir)
+                writeSPPASDirCache(key, opts.sppas_dir)
+            else:
+                sys.exit("Any SPPAS directory !")
+    _sppasPath = os.path.abspath(os.path.join(opts.sppas_dir, 'sppas', 'src'))
+    return _sppasPath
+
+def sppasDirCacheFile():
+    """ The file keeping the SPPAS directory found for each (home, version),
+        in SPPAS_TOOLS_CACHE (default to ${XDG_CACHE_HOME:-${HOME}/.cache}/sppas_tools/sppas_dirs)
+    """
+    return os.environ.get('SPPAS_TOOLS_CACHE') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        , 'sppas_tools', 'sppas_dirs')
+
+def readSPPASDirCache():
+    """ @return the cached SPPAS directories, a dict (home, version) => directory """
+    cache = {}
+    try:
+        with open(sppasDirCacheFile()) as fd:
+            for line in fd:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 3:
+                    cache[(fields[0], fields[1])] = fields[2]
+    except (IOError, OSError):
+        pass
+    return cache
+
+def writeSPPASDirCache(key, directory):
+    """ Keep the SPPAS directory of a (home, version) in the cache file (errors are ignored) """
+    cache = readSPPASDirCache()
+    cache[key] = directory
+    filename = sppasDirCacheFile()
+    try:
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        tmp = "%s.%d" % (filename, os.getpid())
+        with open(tmp, 'w') as out:
+            for ((home, version), value) in sorted(cache.items()):
+                out.write("%s\t%s\t%s\n" % (home, version, value))
+        os.rename(tmp, filename)    # atomic, for the concurrent invocations
+    except (IOError, OSError):
+        pass
+
+def load_sppas(opts, verbose=True):
+    """ Method to load SPPAS API
+        Use global sppas_dir/sppas_version to find the SPPAS directory (see sppasPath)
+        Then 'import' annotationdata, i.e. put a LazyModule in the __main__
+        namespace: the real import is done at the first use.
+        @param verbose  print (or not) the chosen SPPAS directory
+    """
+    log = print if verbose else (lambda *args: None)
+    if getattr(opts, 'startup_profile', False):
+        startStartupProfile()
+    with startupStep("find SPPAS directory"):
+        sppas_path = sppasPath(opts, log)
+    if sppas_path not in sys.path:
+        sys.path.insert(0,sppas_path)
     # Import SPPAS API
     #global annotationdata
-    import annotationdata
+    annotationdata = sys.modules.get('annotationdata') or LazyModule('annotationdata')
     # copy 'annotationdata' into __main__ namespace
     import __main__
     __main__.annotationdata = annotationdata
     #print(globals())
+    # (b) Parsed transcriptions cache
+    cache_dir = getattr(opts, 'cache_dir', None)
+    if not cache_dir and os.environ.get('SPPAS_CACHE_DIR'):
+        opts.cache_dir = cache_dir = os.environ['SPPAS_CACHE_DIR']
+    if cache_dir:
+        log("Use parsed transcriptions cache directory:%s" % cache_dir)
+        setTranscriptionCache(TranscriptionCache(cache_dir, getattr(opts, 'cache_size', None)))
 
 def getAnnotationdataAio():
     """ Return the SPPAS annotationdata.aio module
          (or annotationdata.io from older version)
+        as a LazyModule, i.e. imported at its first use
+        If a TranscriptionCache is set, return a CachedAio wrapper of the module
     """
-    try:
-        import annotationdata.aio as aio
-        #print("annotationdata.aio imported as aio")
-    except ImportError:
-        import annotationdata.io as aio
-        #print("annotationdata.io imported as aio")
+    aio = LazyModule('annotationdata.aio', 'annotationdata.io')
     #import __main__
     #__main__.aio = aio
+    if _transcriptionCache is not None:
+        return CachedAio(aio, _transcriptionCache)
     return aio
 
+class LazyModule(object):
+    """ Proxy of a module imported at its first use (attribute access)
+        The attributes set on the proxy are kept by the proxy
+        (b.e. annotationdata.aio = getAnnotationdataAio() doesn't import annotationdata)
+    """
+    def __init__(self, name, *fallbacks):
+        """
+            @param name         the module name
+            @param fallbacks    the modules names to try if name can't be imported
+        """
+        self.__dict__['_names'] = (name,) + fallbacks
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            for name in self._names:
+                try:
+                    __import__(name)
+                    self.__dict__['_module'] = sys.modules[name]
+                    break
+                except ImportError:
+                    if name == self._names[-1]: raise
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        self.__dict__[name] = value
+
+    def __repr__(self):
+        return "<lazy module %r%s>" % (self._names[0], "" if self._module is None else " (loaded)")
+
+
+# ----------------------------------------------------------------------------
+# --- Startup profile (see --startup-profile)
+# ----------------------------------------------------------------------------
+
+_startupProfile = None  # list of (depth, step, duration), or None (no profile)
+_startupDepth = [0]
+_startTime = None
+def startStartupProfile():
+    """ Record the time spent in each (new) module import and startup step,
+        and report them on stderr at exit
+    """
+    global _startupProfile, _startTime
+    if _startupProfile is not None:
+        return
+    import __builtin__, atexit, time
+    _startupProfile = []
+    _startTime = time.time()
+    builtinImport = __builtin__.__import__
+    def profiledImport(name, globals=None, locals=None, fromlist=None, level=-1):
+        if name in sys.modules:
+            return builtinImport(name, globals, locals, fromlist, level)
+        (index, loaded) = (len(_startupProfile), len(sys.modules))
+        try:
+            with startupStep("import %s" % (name or "."*level)):
+                return builtinImport(name, globals, locals, fromlist, level)
+        finally:
+            if len(sys.modules) == loaded: # any new module (b.e. a relative import of a loaded one)
+                del _startupProfile[index:]
+    __builtin__.__import__ = profiledImport
+    atexit.register(reportStartupProfile)
+
+class startupStep(object):
+    """ Context manager recording the duration of a startup step (if profiled) """
+    def __init__(self, step):
+        self.step = step
+
+    def __enter__(self):
+        if _startupProfile is not None:
+            import time
+            self.index = len(_startupProfile)
+            _startupProfile.append((_startupDepth[0], self.step, None))
+            _startupDepth[0] += 1
+            self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        if _startupProfile is not None and hasattr(self, 'start'):
+            import time
+            _startupDepth[0] -= 1
+            _startupProfile[self.index] = (_startupDepth[0], self.step, time.time() - self.start)
+
+def reportStartupProfile(out=None):
+    """ Print the recorded startup steps (and nested imports) durations """
+    import time
+    out = out or sys.stderr
+    total = time.time() - _startTime
+    print("[startup] time spent in each import/step (ms), nested ones are indented:", file=out)
+    for (depth, step, duration) in _startupProfile:
+        print("[startup] %9.3f %s%s" % ((duration or 0.) * 1000, '  ' * depth, step), file=out)
+    imports = sum(duration or 0. for (depth, step, duration) in _startupProfile if depth == 0)
+    print("[startup] %9.3f total (since the profile start), with %.3f in imports/steps" % (total * 1000, imports * 1000), file=out)
+
+# start the profile as soon as sppas_tools is imported (the scripts import it
+# before their other modules), so the script level imports (b.e. numpy) are reported too
+if '--startup-profile' in sys.argv:
+    startStartupProfile()
+
+def getSPPASVersion():
+    """ Return a string identifying the loaded SPPAS
+        (version, if found, and real path of annotationdata)
+    """
+    import annotationdata
+    try:
+        import sp_glob
+        version = sp_glob.version
+    except (ImportError, AttributeError):
+        version = '?'
+    return "%s:%s" % (version, os.path.realpath(os.path.dirname(annotationdata.__file__)))
+
+
+# ----------------------------------------------------------------------------
+# --- Parsed transcriptions cache
+# ----------------------------------------------------------------------------
+
+_transcriptionCache = None
+def setTranscriptionCache(cache):
+    """ Set (or unset with None) the TranscriptionCache used by getAnnotationdataAio """
+    global _transcriptionCache
+    _transcriptionCache = cache
+
+class TranscriptionCache(object):
+    """ On-disk cache of the parsed Transcription (pickled)
+        An entry is keyed by the file path, mtime and size, and the SPPAS version.
+        The cache size is bounded, the least recently used entries are removed first.
+    """
+    def __init__(self, cache_dir, max_size=None):
+        """
+            @param cache_dir    the cache directory (created if needed)
+            @param max_size     the maximum size of the cache, in MB (default:1024)
+        """
+        self.cache_dir = cache_dir
+        self.max_size = int((max_size if max_size is not None else 1024) * 1024 * 1024)
+        self.version = None # SPPAS version, see getSPPASVersion()
+
+    def key(self, filename):
+        import hashlib
+        if self.version is None:
+            self.version = getSPPASVersion()
+        st = os.stat(filename)
+        return hashlib.sha1("|".join([os.path.abspath(filename), repr(st.st_mtime), str(st.st_size), self.version])).hexdigest()
+
+    def read(self, filename, reader):
+        """ Get the cached Transcription of a file, or read it with reader(filename) and cache it """
+        import cPickle
+        try:
+            path = os.path.join(self.cache_dir, self.key(filename) + '.pickle')
+        except OSError: # no such file => let reader fails
+            return reader(filename)
+        try:
+            with open(path, 'rb') as fd:
+                trs = cPickle.load(fd)
+            os.utime(path, None)    # last use
+            return trs
+        except Exception: # IOError (no entry), EOFError/UnpicklingError (corrupted entry), ...
+            pass
+        trs = reader(filename)
+        self.store(path, trs)
+        return trs
+
+    def store(self, path, trs):
+        """ Write the cache entry (atomically, for concurrent processes) then bound the cache size """
+        import cPickle, tempfile
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            (fd, tmp) = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                cPickle.dump(trs, f, cPickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, path)
+        except Exception as e: # OSError/IOError, PicklingError, ...
+            print("(!) Can't cache '%s': %s" % (path, e), file=sys.stderr)
+            if 'tmp' in locals() and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def evict(self):
+        """ Remove the least recently used entries until the cache size is under max_size """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pickle'): continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError: # removed by another process
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        size = sum([e[1] for e in entries])
+        entries.sort()
+        for (mtime, esize, path) in entries:
+            if size <= self.max_size: break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= esize
+
+class CachedAio(object):
+    """ Wrapper of the annotationdata.aio module whose read() use a TranscriptionCache """
+    def __init__(self, aio, cache):
+        self.aio = aio
+        self.cache = cache
+
+    def read(self, filename):
+        return self.cache.read(filename, self.aio.read)
+
+    def __getattr__(self, name):
+        return getattr(self.aio, name)
+
 
 # ----------------------------------------------------------------------------
 def parserAddLoadSPPASArgument(parser):
@@ -85,9 +369,370 @@ def parserAddLoadSPPASArgument(parser):
         , help='change the spass version (default to SPPAS_VERSION environment variable)'
         , metavar='<str>'
     )
+    # cache_dir/cache_size
+    parser.add_argument("--cache-dir", dest='cache_dir'
+        , help='cache the parsed annotation files in this directory (default to SPPAS_CACHE_DIR environment variable, or any cache)'
+        , metavar='<dir>'
+    )
+    parser.add_argument("--cache-size", dest='cache_size', type=float
+        , help='maximum size of the cache, in MB (default:1024)'
+        , metavar='<MB>'
+    )
+    # startup_profile
+    parser.add_argument("--startup-profile", dest='startup_profile', action='store_true'
+        , help='report (on stderr) the time spent in each import, b.e. the SPPAS modules loading'
+    )
+    return parser;
+
+def parserAddInventoryArgument(parser):
+    # inventory
+    parser.add_argument("--inventory", dest='inventory'
+        , help='corpus inventory (SQLite file) built by sppas_info.py (default to SPPAS_INVENTORY environment variable)'
+        , metavar='<db>'
+    )
+    # require_tiers
+    parser.add_argument("--require-tier", dest='require_tiers', action='append'
+        , help='skip the files that the corpus inventory knows to not have this tier (repeat the option for various tiers)'
+        , metavar='<tier>'
+    )
     return parser;
 
-    
+def parserAddJobsArgument(parser):
+    if parser is None:
+        import argparse
+        parser = argparse.ArgumentParser()
+    # jobs
+    parser.add_argument("-j", "--jobs", dest='jobs', type=int, default=1
+        , help='number of parallel processes used for the files (default:1, 0 => number of CPUs)'
+        , metavar='<N>'
+    )
+    return parser;
+
+
+# ----------------------------------------------------------------------------
+# --- Files processing
+# ----------------------------------------------------------------------------
+
+# ----------------------------------------------------------------------------
+def processFiles(process_file, files, opts, callback=None, log=print):
+    """ Apply process_file(f, opts) on each file.
+        With opts.jobs > 1 (or 0 => number of CPUs) the files are sent to a
+        pool of processes, each one loading SPPAS once. The output of each
+        file is buffered by the worker and printed at once, in the files order.
+        @param process_file a (module level) function(f, opts)
+        @param files    the file(s) to process
+        @param opts     the script options (with 'jobs')
+        @param callback (optional) a function(f, result) called in the main process,
+            in the files order, as soon as a file is processed ; its return value
+            replaces the file result (e.g. to not keep the results in memory)
+        @param log      (optional) a function(message) for the skipped files messages
+        @return the list of process_file results (None for a failed file in a pool)
+        The files that the corpus inventory knows to not have the required tiers
+        are skipped (see selectFiles).
+    """
+    if callback is None:
+        callback = lambda f, result: result
+    files = selectFiles(files, opts, log)
+    jobs = getattr(opts, 'jobs', 1)
+    if jobs is None: jobs = 1
+    if jobs <= 0:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(files))
+    if jobs <= 1:   # sequential
+        return [callback(f, process_file(f, opts)) for f in files]
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs, _initWorker, (opts,))
+    results = []
+    try:
+        for (f, output, result, error) in pool.imap(_processFileWorker, [(process_file, f, opts) for f in files]):
+            sys.stdout.write(output)
+            sys.stdout.flush()
+            if error:
+                print("[%s] (!) processing failed:\n%s" % (f, error), file=sys.stderr)
+            results.append(callback(f, result))
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+def _initWorker(opts):
+    """ Pool initializer: load SPPAS (once per worker) """
+    load_sppas(opts, verbose=False)
+    import __main__
+    __main__.annotationdata.aio = getAnnotationdataAio()
+
+def _processFileWorker(args):
+    """ Process one file in a worker, buffering its output
+        @return (f, output, result, error)
+    """
+    import traceback
+    from StringIO import StringIO
+    (process_file, f, opts) = args
+    stdout = sys.stdout
+    sys.stdout = buf = StringIO()
+    result = error = None
+    try:
+        result = process_file(f, opts)
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        sys.stdout = stdout
+    return (f, buf.getvalue(), result, error)
+
+
+# ----------------------------------------------------------------------------
+# --- Tiers information (metadata only) readers
+# ----------------------------------------------------------------------------
+
+def readTiersInfo(filename):
+    """ Read the tiers information of an annotation file, without the SPPAS
+        (full) reader, i.e. with an incremental parse that skips the labels
+        and stops as soon as possible. Supported formats: EAF, TextGrid (long
+        text format) and XRA.
+        @return the list of (tier name, number of annotations, begin, end) ;
+            (begin, end) are (None, None) for an empty tier.
+            None if the format isn't supported (or the file needs the SPPAS reader)
+    """
+    readers = { '.eaf': _eafTiersInfo, '.textgrid': _textGridTiersInfo, '.xra': _xraTiersInfo }
+    reader = readers.get(os.path.splitext(filename)[1].lower())
+    if reader is None:
+        return None
+    try:
+        return reader(filename)
+    except Exception:
+        return None # let the SPPAS reader report the error
+
+def transcriptionTiersInfo(trs):
+    """ The tiers information of a Transcription (see readTiersInfo) """
+    return [ (tier.GetName(), tier.GetSize()
+        , tier.GetBeginValue() if tier.GetSize() else None
+        , tier.GetEndValue() if tier.GetSize() else None) for tier in trs ]
+
+def tiersInfoTimes(tiersInfo):
+    """ The (min, max) times of tiers information (see readTiersInfo), None for empty tiers """
+    begins = [ begin for (name, size, begin, end) in tiersInfo if size ]
+    ends = [ end for (name, size, begin, end) in tiersInfo if size ]
+    return (min(begins), max(ends)) if begins else None
+
+class _TierInfo(object):
+    """ the information of a tier while it's read """
+    def __init__(self, name):
+        self.name = name; self.size = 0; self.begin = None; self.end = None
+    def add(self, begin, end):
+        self.size += 1
+        if self.begin is None or begin < self.begin: self.begin = begin
+        if self.end is None or end > self.end: self.end = end
+    def info(self):
+        return (self.name, self.size, self.begin, self.end)
+
+def _xmlTag(elem):
+    """ the XML tag without namespace """
+    return elem.tag.rsplit('}', 1)[-1]
+
+def _eafTiersInfo(filename):
+    """ EAF: the time slots, then the tiers (that are followed by the linguistic types, etc.) """
+    from xml.etree.cElementTree import iterparse
+    slots = {}  # time slot id => time (in second)
+    times = {}  # annotation id => (begin, end), for the reference annotations
+    tiers = []; tier = None
+    for (event, elem) in iterparse(filename, events=('start', 'end')):
+        tag = _xmlTag(elem)
+        if event == 'start':
+            if tag == 'TIER':
+                tier = _TierInfo(elem.get('TIER_ID')); tiers.append(tier)
+            elif tiers and tag not in ('ANNOTATION', 'ALIGNABLE_ANNOTATION', 'REF_ANNOTATION', 'ANNOTATION_VALUE'):
+                break;  # after the tiers
+            continue;
+        if tag == 'TIME_SLOT':
+            value = elem.get('TIME_VALUE')
+            slots[elem.get('TIME_SLOT_ID')] = float(value) / 1000. if value is not None else None
+        elif tag == 'ALIGNABLE_ANNOTATION':
+            (begin, end) = (slots.get(elem.get('TIME_SLOT_REF1')), slots.get(elem.get('TIME_SLOT_REF2')))
+            if begin is None or end is None:
+                return None # unaligned time slots => SPPAS reader
+            times[elem.get('ANNOTATION_ID')] = (begin, end)
+            tier.add(begin, end)
+        elif tag == 'REF_ANNOTATION':
+            (begin, end) = times.get(elem.get('ANNOTATION_REF'), (None, None))
+            if begin is None:
+                return None # unknown parent annotation => SPPAS reader
+            times[elem.get('ANNOTATION_ID')] = (begin, end)
+            tier.add(begin, end)
+        elif tag == 'ANNOTATION':
+            elem.clear()
+    return [ tier.info() for tier in tiers ]
+
+def _xraTiersInfo(filename):
+    """ XRA: the tiers (that are followed by the media, hierarchy, etc.) """
+    from xml.etree.cElementTree import iterparse
+    tiers = []; tier = None; points = []
+    for (event, elem) in iterparse(filename, events=('start', 'end')):
+        tag = _xmlTag(elem)
+        if event == 'start':
+            if tag == 'Tier':
+                tier = _TierInfo(elem.get('tiername')); tiers.append(tier)
+            elif tag == 'Disjoint':
+                return None # disjoint intervals => SPPAS reader
+            elif tiers and tier is None and tag != 'Tier':
+                break;  # after the tiers
+            continue;
+        if tag in ('Begin', 'End', 'Point'):
+            points.append(float(elem.get('midpoint')))
+        elif tag == 'Annotation':
+            tier.add(points[0], points[-1]); points = []
+            elem.clear()
+        elif tag == 'Tier':
+            tier = None
+    if [ t for t in tiers if t.name is None ]:
+        return None
+    return [ tier.info() for tier in tiers ]
+
+def _textGridTiersInfo(filename):
+    """ TextGrid (long text format): the 'key = value' lines of each tier's intervals/points """
+    import codecs
+    with open(filename, 'rb') as fd:
+        bom = fd.read(4)
+    encoding = 'utf-16' if bom[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 'utf-8-sig'
+    tiers = []; tier = None
+    begin = end = None
+    with codecs.open(filename, 'r', encoding) as fd:
+        lines = iter(fd)
+        header = [ lines.next().strip() for i in range(3) ]
+        if not header[0].startswith('File type = "ooTextFile') or 'TextGrid' not in header[1]:
+            return None
+        for line in lines:
+            (key, sep, value) = line.strip().partition(' = ')
+            if not sep:
+                if key.startswith('item ['):
+                    tier = None
+                continue;
+            if key in ('text', 'mark'):
+                # skip the string, that can be on various lines (a quote inside is doubled)
+                while value.count('"') % 2:
+                    value += lines.next()
+                if tier is not None:
+                    tier.add(begin, end)
+            elif tier is None:
+                if key == 'name':
+                    tier = _TierInfo(value.strip()[1:-1].replace('""', '"')); tiers.append(tier)
+                elif key == 'class' and value.strip().strip('"') not in ('IntervalTier', 'TextTier'):
+                    return None
+            elif key == 'xmin':
+                begin = float(value)
+            elif key == 'xmax':
+                end = float(value)
+            elif key in ('number', 'time'):
+                begin = end = float(value)
+    if not tiers:
+        return None
+    return [ tier.info() for tier in tiers ]
+
+# ----------------------------------------------------------------------------
+# --- Corpus inventory
+# ----------------------------------------------------------------------------
+
+def inventoryFilename(opts):
+    """ The corpus inventory file (option --inventory or SPPAS_INVENTORY environment variable) """
+    return getattr(opts, 'inventory', None) or os.environ.get('SPPAS_INVENTORY')
+
+_inventories = {}
+def getInventory(filename):
+    """ The CorpusInventory of a file (one per process) """
+    key = (os.path.abspath(filename), os.getpid())
+    if key not in _inventories:
+        _inventories[key] = CorpusInventory(filename)
+    return _inventories[key]
+
+def tierNameKey(name):
+    """ The tier name used to compare tiers names (see tierFind) """
+    return name.lower().replace(" ","")
+
+class CorpusInventory(object):
+    """ A persistent (SQLite) inventory of annotation files: for each file, its
+        modification time and size, min/max times and its tiers information
+        (see readTiersInfo). An entry is only used while the file's modification
+        time and size are unchanged.
+    """
+    def __init__(self, filename):
+        import sqlite3
+        self.db = sqlite3.connect(filename, timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL, size INTEGER, min_time REAL, max_time REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS tiers (path TEXT, position INTEGER, name TEXT, name_key TEXT, size INTEGER, begin REAL, end REAL, PRIMARY KEY (path, position))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS tiers_name_key ON tiers (name_key)")
+        self.db.commit()
+        self.pending = 0
+
+    @staticmethod
+    def fileKey(filename):
+        """ @return (path, mtime, size) of a file """
+        st = os.stat(filename)
+        return (os.path.abspath(filename), st.st_mtime, st.st_size)
+
+    def lookup(self, filename):
+        """ @return (tiersInfo, (min, max) times) of an up to date file, else None """
+        try:
+            (path, mtime, size) = self.fileKey(filename)
+        except OSError:
+            return None # missing file
+        row = self.db.execute("SELECT min_time, max_time FROM files WHERE path=? AND mtime=? AND size=?", (path, mtime, size)).fetchone()
+        if row is None:
+            return None
+        tiersInfo = [ tuple(tier) for tier in self.db.execute("SELECT name, size, begin, end FROM tiers WHERE path=? ORDER BY position", (path,)) ]
+        return (tiersInfo, row)
+
+    def update(self, fileKey, tiersInfo, times):
+        """ Store the information of a file
+            @param fileKey  the file (path, mtime, size), see fileKey()
+            @param tiersInfo the tiers information (see readTiersInfo)
+            @param times    the (min, max) times
+        """
+        (path, mtime, size) = fileKey
+        self.db.execute("DELETE FROM tiers WHERE path=?", (path,))
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (path, mtime, size, times[0], times[1]))
+        self.db.executemany("INSERT INTO tiers VALUES (?, ?, ?, ?, ?, ?, ?)"
+            , [ (path, i, name, tierNameKey(name), count, begin, end) for i, (name, count, begin, end) in enumerate(tiersInfo) ])
+        self.pending += 1
+        if self.pending >= 100:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def hasTiers(self, filename, names):
+        """ @return True/False if an up to date file has all the tiers (compared as tierFind), else None """
+        if self.lookup(filename) is None:
+            return None
+        path = os.path.abspath(filename)
+        keys = set([ row[0] for row in self.db.execute("SELECT name_key FROM tiers WHERE path=?", (path,)) ])
+        return all(tierNameKey(name) in keys for name in names)
+
+    def filesWithTier(self, name):
+        """ @return the paths of the (inventoried) files with a tier (compared as tierFind) """
+        return [ row[0] for row in self.db.execute("SELECT DISTINCT path FROM tiers WHERE name_key=? ORDER BY path", (tierNameKey(name),)) ]
+
+def selectFiles(files, opts, log=print):
+    """ Skip the files that the corpus inventory (see inventoryFilename) knows
+        to not have all the required tiers (opts.require_tiers)
+        @param log  a function(message) for the skipped files messages
+    """
+    filename = inventoryFilename(opts)
+    required = getattr(opts, 'require_tiers', None)
+    if not filename or not required or not os.path.exists(filename):
+        return files
+    inventory = getInventory(filename)
+    selected = []
+    for f in files:
+        if inventory.hasTiers(f, required) is False:
+            log("[%s] Skipped, any tier similar to '%s' (inventory)" % (f, "' or '".join([ name for name in required if not inventory.hasTiers(f, [name]) ])))
+        else:
+            selected.append(f)
+    return selected
+
 # ----------------------------------------------------------------------------
 def tierFind(trs, name):
     """ Robust search of a tier.
@@ -96,14 +741,85 @@ def tierFind(trs, name):
         @param trs  the annotationdata
         @param name the tier name
     """
-    tier = trs.Find(name, case_sensitive=False)
+    index = tierNameIndex(trs)
+    tier = index.find(name, case_sensitive=False)
     if tier is not None: return tier; # find with the exact name
-    nname = name.lower().replace(" ","")
-    for tier in trs:
-        tname = tier.GetName().lower().replace(" ","")
-        if tname == nname: return tier
-        #else: print("Tier name '{}' != '{}' (searched name)".format(tname, nname))
-    return None
+    return index.find(name, normalized=True)
+
+class TierNameIndex(object):
+    """ Index of the tiers of a Transcription by name, with the exact,
+        lower case and normalized (see tierNameKey) names as keys.
+        As Transcription.Find/GetIndex, the first tier with a name is found.
+        Use tierNameIndex() to get the (cached) index of a Transcription.
+    """
+    def __init__(self, trs):
+        self.tiers = []
+        self.names = [] # the tiers names when indexed (see isValid)
+        self.keys = ({}, {}, {})    # exact, lower case, normalized name => position
+        for tier in trs:
+            self.append(tier)
+
+    @staticmethod
+    def nameKeys(name):
+        return (name, name.lower(), tierNameKey(name))
+
+    def append(self, tier):
+        """ Add a tier (appended to the Transcription) """
+        position = len(self.tiers)
+        self.tiers.append(tier)
+        self.names.append(tier.GetName())
+        for (keys, key) in zip(self.keys, self.nameKeys(self.names[-1])):
+            keys.setdefault(key, position)
+
+    def index(self, name, case_sensitive=True, normalized=False):
+        """ @return the position of the first tier with this name (or -1) """
+        kind = 2 if normalized else (0 if case_sensitive else 1)
+        return self.keys[kind].get(self.nameKeys(name)[kind], -1)
+
+    def find(self, name, case_sensitive=True, normalized=False):
+        """ @return the first tier with this name (or None) """
+        position = self.index(name, case_sensitive, normalized)
+        return self.tiers[position] if position >= 0 else None
+
+    def isValid(self, trs):
+        """ Is the index still valid for the Transcription ?
+            i.e. the same tiers, in the same order, with the same names
+            (any tier replaced, moved, removed, added or renamed => not valid)
+        """
+        if len(self.tiers) != trs.GetSize():
+            return False
+        for (tier, indexed, name) in zip(trs, self.tiers, self.names):
+            if tier is not indexed or tier.GetName() != name:
+                return False
+        return True
+
+def tierNameIndex(trs):
+    """ The TierNameIndex of a Transcription, built once and rebuilt when the
+        index isn't valid (tiers changed without appendTier/popTier/addTier, or renamed)
+    """
+    index = getattr(trs, '_tier_name_index', None)
+    if index is None or not index.isValid(trs):
+        index = trs._tier_name_index = TierNameIndex(trs)
+    return index
+
+def appendTier(trs, tier):
+    """ Transcription.Append, updating the tiers names index """
+    index = getattr(trs, '_tier_name_index', None)
+    if index is not None and not index.isValid(trs):
+        index = trs._tier_name_index = None
+    trs.Append(tier)
+    if index is not None:
+        index.append(tier)
+
+def popTier(trs, position=-1):
+    """ Transcription.Pop, invalidating the tiers names index """
+    trs._tier_name_index = None
+    return trs.Pop(position)
+
+def addTier(trs, tier, position=None):
+    """ Transcription.Add, invalidating the tiers names index """
+    trs._tier_name_index = None
+    return trs.Add(tier, position)
 
 def parentdir(f, level=0):
     i=0; p=f;